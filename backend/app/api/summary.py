@@ -1,7 +1,19 @@
+import json
+import threading
 from pydantic import BaseModel
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 from typing import List, Optional
-from app.services.summaryTask_service import process_meeting_summary  # Import the service function
+from app.services.summaryTask_service import (  # Import the service functions
+    process_meeting_summary,
+    stream_meeting_summary,
+    estimate_summary_cost,
+    summary_cache
+)
+from app.services.registry import engine_registry
+from app.services.admission import summary_admission, AdmissionRejected
 
 summary_router = APIRouter()
 
@@ -22,13 +34,85 @@ async def process_meeting(transcript: List[TranscriptEntry]):
     if not transcript:
         raise HTTPException(status_code=400, detail="Transcript data is missing")
 
+    if not engine_registry.is_enabled("summary"):
+        raise HTTPException(status_code=503, detail="Meeting summarization is not enabled on this server")
+
     try:
         # Convert Pydantic models to dictionaries before passing them to the processing function
         transcript_dicts = [entry.dict() for entry in transcript]
 
-        # Call the imported process_meeting_summary function
-        result = process_meeting_summary(transcript_dicts)
+        # Wait for room for this many transcript tokens, or get 429 when the queue is full
+        cost = await run_in_threadpool(estimate_summary_cost, transcript_dicts)
+        async with summary_admission.admitted(cost):
+            # Generation blocks for a long time, keep it off the event loop
+            result = await run_in_threadpool(process_meeting_summary, transcript_dicts)
 
         return {"status": "success", "data": result}
+    except AdmissionRejected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing meeting summary: {str(e)}")
+
+
+@summary_router.post("/process-meeting/stream")
+async def process_meeting_stream(transcript: List[TranscriptEntry]):
+    """
+    Server-sent events variant of /process-meeting. Streams generated tokens,
+    each summary section and action item as soon as it is complete, and a final
+    `done` event with the same data /process-meeting returns.
+    """
+    if not transcript:
+        raise HTTPException(status_code=400, detail="Transcript data is missing")
+
+    if not engine_registry.is_enabled("summary"):
+        raise HTTPException(status_code=503, detail="Meeting summarization is not enabled on this server")
+
+    transcript_dicts = [entry.dict() for entry in transcript]
+
+    # Admit before the response starts, so a full queue still gets a plain 429;
+    # the stream holds its place until it ends or the client goes away
+    cost = await run_in_threadpool(estimate_summary_cost, transcript_dicts)
+    ticket = summary_admission.enqueue(cost)
+    try:
+        await summary_admission.wait_async(ticket, summary_admission.max_wait)
+    except BaseException:
+        summary_admission.release(ticket)
+        raise
+
+    stop = threading.Event()
+
+    # A plain generator: the response iterates it in the threadpool, so generation never blocks the loop
+    def event_stream():
+        try:
+            for event, data in stream_meeting_summary(transcript_dicts, stop):
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            error = {"error": f"Error processing meeting summary: {str(e)}"}
+            yield f"event: error\ndata: {json.dumps(error, ensure_ascii=False)}\n\n"
+        finally:
+            summary_admission.release(ticket)
+
+    def finish():
+        # Runs once the response ended or the client went away: stop generating for
+        # nobody and give the slot back (also when the stream never started; both are idempotent)
+        stop.set()
+        summary_admission.release(ticket)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(finish)
+    )
+
+
+@summary_router.get("/cache/stats")
+async def get_summary_cache_stats():
+    """
+    Hit/miss counters and size of the window-notes and summary cache, and of the
+    sentiment cache once the sentiment engine is loaded.
+    """
+    stats = {"enabled": False} if summary_cache is None else {"enabled": True, **summary_cache.stats()}
+    if engine_registry.is_loaded("sentiment"):
+        stats["sentiment"] = engine_registry.get("sentiment").stats()
+    return stats
@@ -1,73 +1,143 @@
-import os
-import tempfile
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse
-from app.services.transcription_whisper import WhisperTranscriptionService
-from app.services.transcription_wav2vec import Wav2Vec2TranscriptionService
-from app.services.transcription_google import GoogleTranscriptionService
-from app.utils.file_handler import save_temp_file, delete_file
-from app.utils.audio_preprocessing import AudioPreprocessor
-import soundfile as sf
-import numpy as np
-from typing import Optional, List, Dict
+import json
+import asyncio
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from app.utils.file_handler import (
+    delete_file,
+    create_workspace,
+    delete_workspace,
+    spool_request_upload,
+    UploadTooLargeError,
+    UploadFormError
+)
+from app.utils.audio_decoding import probe_duration
+from app.services.job_service import job_manager
+from app.services.admission import google_admission, live_admission, AdmissionRejected
+from app.services.live_transcription import LiveTranscriptionSession
+from app.services.registry import engine_registry
+from app.utils.transcript_cache import transcript_cache
+from app.core.config import settings
 
 transcription_router = APIRouter()
 
-# Initialize services
-whisper_service = WhisperTranscriptionService()
-wav2vec_service = Wav2Vec2TranscriptionService()
-google_service = GoogleTranscriptionService()
-audio_preprocessor = AudioPreprocessor()
+# Rough bitrate (128 kbit/s) for estimating audio length when it can't be probed
+FALLBACK_BYTES_PER_SECOND = 16000
+# Densest audio accepted (uncompressed 48 kHz stereo 16-bit WAV): no upload within the
+# duration limit can be larger than the limit at this rate
+MAX_BYTES_PER_SECOND = 192000
 
-def save_audio_to_temp_file(audio_array, sample_rate):
+# Upload endpoints read their multipart body from the raw Request (see receive_upload),
+# so FastAPI can't derive the form from parameters; this documents it in OpenAPI instead
+UPLOAD_FORM_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {
+                        "file": {
+                            "type": "string",
+                            "format": "binary",
+                            "description": "Audio file to transcribe (MP3, WAV, M4A or OGG)"
+                        },
+                        "language_code": {
+                            "type": "string",
+                            "default": "bn-BD",
+                            "description": "Language code for transcription"
+                        },
+                    },
+                }
+            }
+        },
+    }
+}
+
+# Services are loaded on first use through the engine registry:
+# engine_registry.get("whisper"), ("wav2vec"), ("google"), ("preprocessor")
+
+def validate_audio_filename(filename: str):
     """
-    Save processed audio to a temporary file with proper handling
+    Reject uploads that are not one of the supported audio formats.
     """
+    if not filename or not filename.lower().endswith((".mp3", ".wav", ".m4a", ".ogg")):
+        raise HTTPException(
+            status_code=400,
+            detail="Unsupported file format. Please upload MP3, WAV, M4A, or OGG files."
+        )
+
+def estimate_upload_seconds(request: Request) -> float:
+    """
+    Audio seconds an upload likely holds, from its Content-Length, so it can be admitted
+    before the body is read. Without a length the duration limit is assumed.
+    """
+    content_length = request.headers.get("content-length", "")
+    if not content_length.isdigit():
+        return settings.UPLOAD_MAX_DURATION_SECONDS
+    seconds = int(content_length) / FALLBACK_BYTES_PER_SECOND
+    if settings.UPLOAD_MAX_DURATION_SECONDS:
+        seconds = min(seconds, settings.UPLOAD_MAX_DURATION_SECONDS)
+    return seconds
+
+async def receive_upload(request: Request, workspace: str):
+    """
+    Stream a multipart upload (an audio `file` field and text fields) from the request
+    body into the workspace and enforce the file type, size and duration limits.
+    The duration limit bounds the stream too (at MAX_BYTES_PER_SECOND), so an upload
+    that can't be short enough is cut off early; the exact check needs the probed
+    duration of the stored file.
+
+    Returns:
+        Tuple[SpooledUpload, float, Dict[str, str]]: path, SHA-256 and size of the
+        stored file; its duration in seconds (estimated from the size when it can't be
+        probed), which is the request's admission cost; and the form's text fields
+    """
+    max_bytes = settings.UPLOAD_MAX_BYTES
+    if settings.UPLOAD_MAX_DURATION_SECONDS:
+        duration_bytes = int(settings.UPLOAD_MAX_DURATION_SECONDS * MAX_BYTES_PER_SECOND)
+        max_bytes = min(max_bytes, duration_bytes) if max_bytes else duration_bytes
+
     try:
-        # Ensure the array is float32 for soundfile
-        if audio_array.dtype != np.float32:
-            audio_array = audio_array.astype(np.float32)
-        
-        # Normalize audio if needed
-        if np.abs(audio_array).max() > 1.0:
-            audio_array = audio_array / np.abs(audio_array).max()
-
-        # Use tempfile to generate a unique temporary file path
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        temp_audio_path = temp_file.name
-        temp_file.close()
-
-        # Save the audio file
-        sf.write(temp_audio_path, audio_array, sample_rate)
-        return temp_audio_path
-    
-    except Exception as e:
-        if temp_audio_path and os.path.exists(temp_audio_path):
-            os.unlink(temp_audio_path)
-        raise Exception(f"Failed to save processed audio: {str(e)}")
+        upload, fields = await spool_request_upload(
+            request,
+            workspace,
+            max_bytes=max_bytes,
+            accept_filename=validate_audio_filename
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadFormError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-# @transcription_router.post("/whisper")
-# async def transcribe_with_whisper(file: UploadFile = File(...)):
+    duration = await run_in_threadpool(probe_duration, upload.path)
+    if duration is None:
+        duration = upload.size / FALLBACK_BYTES_PER_SECOND
+    elif settings.UPLOAD_MAX_DURATION_SECONDS and duration > settings.UPLOAD_MAX_DURATION_SECONDS:
+        delete_file(upload.path)
+        raise HTTPException(
+            status_code=413,
+            detail=f"Audio is {duration / 60:.1f} minutes long, "
+                   f"the limit is {settings.UPLOAD_MAX_DURATION_SECONDS / 60:.0f} minutes"
+        )
+    return upload, duration, fields
+
+# @transcription_router.post("/whisper", openapi_extra=UPLOAD_FORM_OPENAPI)
+# async def transcribe_with_whisper(request: Request):
 #     """
 #     Endpoint for transcribing audio using Whisper with audio preprocessing.
 #     """
-#     temp_files = []
+#     workspace = create_workspace()
     
 #     try:
-#         # Validate file type
-#         if not file.filename.lower().endswith(('.mp3', '.wav', '.m4a', '.ogg')):
-#             raise HTTPException(
-#                 status_code=400,
-#                 detail="Unsupported file format. Please upload MP3, WAV, M4A, or OGG files."
-#             )
-
-#         # Save uploaded file
-#         temp_path = save_temp_file(file)
-#         temp_files.append(temp_path)
+#         # Save uploaded file, refusing unsupported formats before any of it is stored
+#         upload, _ = await spool_request_upload(request, workspace, accept_filename=validate_audio_filename)
+#         temp_path = upload.path
 
 #         # Preprocess the audio file
 #         try:
-#             audio_array, sample_rate = audio_preprocessor.preprocess(temp_path)
+#             audio_array, sample_rate = engine_registry.get("preprocessor").preprocess(temp_path)
 #             duration = len(audio_array) / sample_rate
 #             print(f"Processed audio duration: {duration:.2f} seconds")
             
@@ -77,19 +147,9 @@ def save_audio_to_temp_file(audio_array, sample_rate):
 #                 detail=f"Audio preprocessing failed: {str(e)}"
 #             )
 
-#         # Save preprocessed audio
+#         # Transcribe the preprocessed samples directly, no intermediate WAV
 #         try:
-#             processed_audio_path = save_audio_to_temp_file(audio_array, sample_rate)
-#             temp_files.append(processed_audio_path)
-#         except Exception as e:
-#             raise HTTPException(
-#                 status_code=500,
-#                 detail=f"Failed to save processed audio: {str(e)}"
-#             )
-
-#         # Transcribe
-#         try:
-#             transcript = whisper_service.transcribe_audio(processed_audio_path)
+#             transcript = engine_registry.get("whisper").transcribe_array(audio_array)
 #         except Exception as e:
 #             raise HTTPException(
 #                 status_code=500,
@@ -112,19 +172,18 @@ def save_audio_to_temp_file(audio_array, sample_rate):
 #         )
 #     finally:
 #         # Clean up temporary files
-#         for temp_file in temp_files:
-#             if temp_file and os.path.exists(temp_file):
-#                 delete_file(temp_file)
+#         delete_workspace(workspace)
 
 
-# @transcription_router.post("/wav2vec")
-# async def transcribe_with_wav2vec(file: UploadFile = File(...)):
+# @transcription_router.post("/wav2vec", openapi_extra=UPLOAD_FORM_OPENAPI)
+# async def transcribe_with_wav2vec(request: Request):
 #     """
 #     Endpoint for transcribing audio using Wav2Vec2.
 #     """
-#     temp_path = save_temp_file(file)
+#     workspace = create_workspace()
 #     try:
-#         transcript = wav2vec_service.transcribe_audio(temp_path)
+#         upload, _ = await spool_request_upload(request, workspace, accept_filename=validate_audio_filename)
+#         transcript = engine_registry.get("wav2vec").transcribe_audio(upload.path)
 #         return {"status": "success", "transcript": transcript}
 #     except Exception as e:
 #         return JSONResponse(
@@ -132,57 +191,60 @@ def save_audio_to_temp_file(audio_array, sample_rate):
 #             content={"status": "error", "error": str(e)}
 #         )
 #     finally:
-#         delete_file(temp_path)
+#         delete_workspace(workspace)
 
 
-@transcription_router.post("/google")
-async def transcribe_with_google(
-    file: UploadFile = File(...),
-    language_code: str = Form("bn-BD")
-):
+@transcription_router.post("/google", openapi_extra=UPLOAD_FORM_OPENAPI)
+async def transcribe_with_google(request: Request):
     """
     Endpoint for transcribing audio using Google Speech-to-Text API.
 
-    Args:
+    Multipart form fields:
         file: Audio file to transcribe
-        language_code: Language code for transcription
+        language_code: Language code for transcription (default bn-BD)
     """
-    temp_files = []
+    workspace = None
 
     try:
-        # Validate file type
-        if not file.filename.lower().endswith((".mp3", ".wav", ".m4a", ".ogg")):
-            raise HTTPException(
-                status_code=400,
-                detail="Unsupported file format. Please upload MP3, WAV, M4A, or OGG files."
-            )
-
-        # Save uploaded file
-        temp_path = save_temp_file(file)
-        temp_files.append(temp_path)
-
-        # Process the audio file using the updated GoogleTranscriptionService
-        try:
-            google_service = GoogleTranscriptionService()
-            transcript = google_service.process_audio(temp_path, language_code=language_code)
+        if not engine_registry.is_enabled("google"):
+            raise HTTPException(status_code=503, detail="Google transcription is not enabled on this server")
 
-            # Format response
-            response = {
-                "status": "success",
-                "transcript": transcript
-            }
+        # Wait for room for this much audio before reading the body, or get 429 when the queue is full
+        async with google_admission.admitted(estimate_upload_seconds(request)) as ticket:
+            # Stream the upload into this request's workspace, hashing it on the way
+            workspace = create_workspace()
+            upload, duration, fields = await receive_upload(request, workspace)
+            language_code = fields.get("language_code") or "bn-BD"
+            google_admission.resize(ticket, duration)
+
+            # Process the audio file using the shared GoogleTranscriptionService
+            try:
+                # Run the blocking chunking and recognition off the event loop
+                google_service = await run_in_threadpool(engine_registry.get, "google")
+                transcript = await run_in_threadpool(
+                    google_service.process_audio,
+                    upload.path,
+                    language_code=language_code,
+                    audio_hash=upload.sha256
+                )
+
+                # Format response
+                response = {
+                    "status": "success",
+                    "transcript": transcript
+                }
 
-            return response
+                return response
 
-        except Exception as e:
-            print(f"Transcription error details: {str(e)}")  # Added for debugging
-            raise HTTPException(
-                status_code=500,
-                detail=f"Google transcription failed: {str(e)}"
-            )
+            except Exception as e:
+                print(f"Transcription error details: {str(e)}")  # Added for debugging
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Google transcription failed: {str(e)}"
+                )
 
-    except HTTPException as he:
-        raise he
+    except (HTTPException, AdmissionRejected):
+        raise
     except Exception as e:
         print(f"Unexpected error: {str(e)}")  # Added for debugging
         raise HTTPException(
@@ -190,7 +252,206 @@ async def transcribe_with_google(
             detail=str(e)
         )
     finally:
-        # Clean up temporary files
-        for temp_file in temp_files:
-            if temp_file and os.path.exists(temp_file):
-                delete_file(temp_file)
+        # Clean up everything the request wrote to disk
+        delete_workspace(workspace)
+
+
+@transcription_router.post("/google/jobs", status_code=202, openapi_extra=UPLOAD_FORM_OPENAPI)
+async def submit_google_transcription_job(request: Request):
+    """
+    Queue a Google Speech-to-Text transcription and return its job id right away.
+    Poll /jobs/{job_id} or subscribe to /jobs/{job_id}/events for progress and the result.
+
+    Multipart form fields:
+        file: Audio file to transcribe
+        language_code: Language code for transcription (default bn-BD)
+    """
+    if not engine_registry.is_enabled("google"):
+        raise HTTPException(status_code=503, detail="Google transcription is not enabled on this server")
+
+    # Take a place in the transcription queue before reading the body, so a full queue is
+    # refused with 429 right away; the job itself waits for its turn
+    ticket = google_admission.enqueue(estimate_upload_seconds(request))
+    workspace = create_workspace()
+    try:
+        upload, duration, fields = await receive_upload(request, workspace)
+        language_code = fields.get("language_code") or "bn-BD"
+        google_admission.resize(ticket, duration)
+    except BaseException:
+        google_admission.release(ticket)
+        delete_workspace(workspace)
+        raise
+
+    def transcribe(progress_callback=None):
+        if not ticket.granted:
+            progress_callback(0.0, "Waiting for capacity")
+            google_admission.wait(ticket)
+        google_service = engine_registry.get("google")
+        transcript = google_service.process_audio(
+            upload.path,
+            language_code=language_code,
+            progress_callback=progress_callback,
+            audio_hash=upload.sha256
+        )
+        return {"transcript": transcript}
+
+    def finish():
+        google_admission.release(ticket)
+        delete_workspace(workspace)
+
+    try:
+        # Tickets are granted in order and the job pool runs jobs in order, so a job waiting
+        # for its ticket never holds a worker that an already admitted job needs
+        job = job_manager.submit("google", transcribe, on_finish=finish)
+    except Exception as e:
+        # Not queued (e.g. the server is shutting down), so finish will never run
+        finish()
+        raise HTTPException(status_code=503, detail=f"Could not queue the transcription job: {str(e)}")
+
+    return {"status": "queued", "job_id": job.job_id}
+
+
+@transcription_router.websocket("/google/live")
+async def live_google_transcription(websocket: WebSocket, language_code: str = "bn-BD"):
+    """
+    Live transcription during a meeting.
+
+    The client sends binary frames of 16 kHz mono 16-bit little-endian PCM and the
+    text message "end" when the meeting is over. The server pushes
+    {"event": "phrase", "start", "end", "text"} for each phrase as soon as it is
+    final, then {"event": "done", "transcript": [...]} with every phrase, in the
+    format /google returns. Failures are sent as {"event": "error", "error"}.
+
+    Each connection holds a live session slot. When all are taken it waits in the
+    queue; if the queue is full or the wait runs out, the server sends an error
+    with "retry_after" and closes with 1013 (try again later).
+    """
+    await websocket.accept()
+    if not engine_registry.is_enabled("google"):
+        await websocket.send_json({"event": "error", "error": "Google transcription is not enabled on this server"})
+        await websocket.close(code=1011)
+        return
+
+    try:
+        async with live_admission.admitted(1):
+            await run_live_session(websocket, language_code)
+    except AdmissionRejected as e:
+        try:
+            await websocket.send_json({"event": "error", "error": str(e), "retry_after": e.retry_after})
+            await websocket.close(code=1013)
+        except Exception:
+            # The client is already gone
+            pass
+
+
+async def run_live_session(websocket: WebSocket, language_code: str):
+    """
+    Feed the connection's audio into a LiveTranscriptionSession and push its phrases.
+    """
+    google_service = await run_in_threadpool(engine_registry.get, "google")
+    loop = asyncio.get_running_loop()
+    updated = asyncio.Event()
+    session = LiveTranscriptionSession(
+        google_service,
+        language_code,
+        on_update=lambda: loop.call_soon_threadsafe(updated.set)
+    )
+
+    async def push_phrases():
+        # The only sender until the stream is done, so phrases keep their order
+        while not session.complete:
+            await updated.wait()
+            updated.clear()
+            for phrase in session.poll():
+                await websocket.send_json({"event": "phrase", **phrase})
+
+    pusher = asyncio.create_task(push_phrases())
+    try:
+        while not pusher.done():
+            receiver = asyncio.ensure_future(websocket.receive())
+            await asyncio.wait({receiver, pusher}, return_when=asyncio.FIRST_COMPLETED)
+            if not receiver.done():
+                # The pusher stopped early, i.e. recognition failed
+                receiver.cancel()
+                break
+            message = receiver.result()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                await run_in_threadpool(session.feed, message["bytes"])
+            elif message.get("text", "").strip() == "end":
+                # Recognize what is left and let the pusher send the last phrases
+                await run_in_threadpool(session.finish)
+                updated.set()
+                await pusher
+                await websocket.send_json({"event": "done", "transcript": session.transcript})
+                await websocket.close()
+                return
+
+        await pusher
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Live transcription error: {str(e)}")
+        try:
+            await websocket.send_json({"event": "error", "error": f"Live transcription failed: {str(e)}"})
+            await websocket.close(code=1011)
+        except Exception:
+            # The client is already gone
+            pass
+    finally:
+        pusher.cancel()
+        session.close()
+
+
+@transcription_router.get("/jobs/{job_id}")
+async def get_transcription_job(job_id: str):
+    """
+    Return the current state of a transcription job, including the transcript once completed.
+    """
+    job = job_manager.snapshot(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@transcription_router.get("/jobs/{job_id}/events")
+async def stream_transcription_job_events(job_id: str):
+    """
+    Server-sent events stream of job progress. The final event carries the result or error.
+    """
+    if job_manager.snapshot(job_id, include_result=False) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        last_version = -1
+        while True:
+            job = job_manager.snapshot(job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'job_id': job_id, 'error': 'Job expired'})}\n\n"
+                break
+
+            if job["version"] != last_version:
+                last_version = job["version"]
+                event = job["status"] if job["finished"] else "progress"
+                yield f"event: {event}\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+
+            if job["finished"]:
+                break
+            await asyncio.sleep(settings.JOB_EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@transcription_router.get("/cache/stats")
+async def get_transcript_cache_stats():
+    """
+    Hit/miss counters and size of the transcript cache.
+    """
+    if transcript_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **transcript_cache.stats()}
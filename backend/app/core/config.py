@@ -1,7 +1,118 @@
+import os
+import tempfile
+
+
+def _name_list(value):
+    """Parse a comma separated env value; None when unset."""
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
 class Settings:
     ALLOW_ORIGINS = ["*"]
     ALLOW_CREDENTIALS = True
     ALLOW_METHODS = ["*"]
     ALLOW_HEADERS = ["*"]
 
+    # Background transcription jobs
+    TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "4"))
+    JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+    JOB_EVENTS_POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "0.5"))
+
+    # Google Speech-to-Text chunk recognition
+    GOOGLE_CHUNK_CONCURRENCY = int(os.getenv("GOOGLE_CHUNK_CONCURRENCY", "8"))
+    GOOGLE_CHUNK_MAX_RETRIES = int(os.getenv("GOOGLE_CHUNK_MAX_RETRIES", "3"))
+    GOOGLE_CHUNK_RETRY_BACKOFF_SECONDS = float(os.getenv("GOOGLE_CHUNK_RETRY_BACKOFF_SECONDS", "1.0"))
+    # Adjacent silence chunks are packed into request windows up to this length
+    GOOGLE_MAX_WINDOW_SECONDS = float(os.getenv("GOOGLE_MAX_WINDOW_SECONDS", "55"))
+    # Windows up to this length use synchronous recognize (the API allows at most 60 s)
+    GOOGLE_SYNC_RECOGNIZE_MAX_SECONDS = float(os.getenv("GOOGLE_SYNC_RECOGNIZE_MAX_SECONDS", "55"))
+    GOOGLE_SPEECH_CLIENT_POOL_SIZE = int(os.getenv("GOOGLE_SPEECH_CLIENT_POOL_SIZE", "2"))
+    # Live WebSocket transcription: seconds of new audio between silence splits of the open buffer
+    LIVE_SPLIT_INTERVAL_SECONDS = float(os.getenv("LIVE_SPLIT_INTERVAL_SECONDS", "0.5"))
+    # Live sessions open at once (0 = no limit) and waiting for a slot; all of them share
+    # GOOGLE_CHUNK_CONCURRENCY recognition workers
+    LIVE_MAX_SESSIONS = int(os.getenv("LIVE_MAX_SESSIONS", "8"))
+    LIVE_MAX_QUEUE = int(os.getenv("LIVE_MAX_QUEUE", "4"))
+    # Streaming audio preprocessing
+    PREPROCESS_BLOCK_SECONDS = float(os.getenv("PREPROCESS_BLOCK_SECONDS", "10"))
+    PREPROCESS_NOISE_HISTORY_SECONDS = float(os.getenv("PREPROCESS_NOISE_HISTORY_SECONDS", "10"))
+    # "fused" (single float32 STFT pass) or "legacy" (filtfilt + separate spectral subtraction)
+    PREPROCESS_ENGINE = os.getenv("PREPROCESS_ENGINE", "fused")
+    PREPROCESS_NOISE_SAMPLE_FRAMES = int(os.getenv("PREPROCESS_NOISE_SAMPLE_FRAMES", "512"))
+    # Process pool for CPU-bound decoding and filtering, 0 runs them in the calling thread
+    AUDIO_PROCESS_WORKERS = int(os.getenv("AUDIO_PROCESS_WORKERS", str(min(os.cpu_count() or 1, 4))))
+    AUDIO_PROCESS_START_METHOD = os.getenv("AUDIO_PROCESS_START_METHOD", "spawn")
+    # Uploads are spooled to disk in chunks; larger or longer ones are rejected with 413 (0 = no limit)
+    UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+    UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(500 * 1024 * 1024)))
+    UPLOAD_MAX_DURATION_SECONDS = float(os.getenv("UPLOAD_MAX_DURATION_SECONDS", str(4 * 3600)))
+    # Admission control: cost units in flight per endpoint (0 = no limit), then a bounded
+    # queue; requests beyond it, or waiting longer than ADMISSION_MAX_WAIT_SECONDS, get 429
+    ADMISSION_GOOGLE_CAPACITY_SECONDS = float(os.getenv("ADMISSION_GOOGLE_CAPACITY_SECONDS", str(2 * 3600)))
+    ADMISSION_GOOGLE_MAX_QUEUE = int(os.getenv("ADMISSION_GOOGLE_MAX_QUEUE", "16"))
+    ADMISSION_SUMMARY_CAPACITY_TOKENS = float(os.getenv("ADMISSION_SUMMARY_CAPACITY_TOKENS", "16000"))
+    ADMISSION_SUMMARY_MAX_QUEUE = int(os.getenv("ADMISSION_SUMMARY_MAX_QUEUE", "8"))
+    ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "120"))
+    ADMISSION_DEFAULT_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_DEFAULT_RETRY_AFTER_SECONDS", "10"))
+    ADMISSION_MAX_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_MAX_RETRY_AFTER_SECONDS", "600"))
+    # Content-addressed transcript cache
+    TRANSCRIPT_CACHE_ENABLED = os.getenv("TRANSCRIPT_CACHE_ENABLED", "true").lower() == "true"
+    TRANSCRIPT_CACHE_DIR = os.getenv(
+        "TRANSCRIPT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "barta_transcript_cache")
+    )
+    TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    # Whisper segments decoded per generate call
+    WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+    # Whisper segments are cut at pauses, between these lengths
+    WHISPER_MAX_SEGMENT_SECONDS = float(os.getenv("WHISPER_MAX_SEGMENT_SECONDS", "28"))
+    WHISPER_MIN_SEGMENT_SECONDS = float(os.getenv("WHISPER_MIN_SEGMENT_SECONDS", "5"))
+    # "torch" (float32), "int8" (dynamically quantized, CPU) or "onnx" (ONNX Runtime via optimum, CPU,
+    # needs requirements-onnx.txt)
+    WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "torch")
+    WHISPER_ONNX_DIR = os.getenv("WHISPER_ONNX_DIR")
+    # CPU threads for the Whisper engine, 0 keeps the library default
+    WHISPER_INTRA_OP_THREADS = int(os.getenv("WHISPER_INTRA_OP_THREADS", "0"))
+    WHISPER_INTER_OP_THREADS = int(os.getenv("WHISPER_INTER_OP_THREADS", "0"))
+    # Wav2Vec2 CTC: fixed windows with stride context on both sides, run in batches
+    WAV2VEC_MODEL = os.getenv("WAV2VEC_MODEL", "tanmoyio/wav2vec2-large-xlsr-bengali")
+    WAV2VEC_CHUNK_SECONDS = float(os.getenv("WAV2VEC_CHUNK_SECONDS", "20"))
+    WAV2VEC_STRIDE_SECONDS = float(os.getenv("WAV2VEC_STRIDE_SECONDS", "2"))
+    WAV2VEC_BATCH_SIZE = int(os.getenv("WAV2VEC_BATCH_SIZE", "4"))
+    # Engines this worker may load (comma separated, unset = all) and those loaded at startup
+    ENABLED_ENGINES = _name_list(os.getenv("ENABLED_ENGINES"))
+    WARMUP_ENGINES = _name_list(os.getenv("WARMUP_ENGINES")) or []
+    # Meeting summarization: prefill the transcript once for both prompts, fast tokenizer
+    SUMMARY_SHARED_PREFIX = os.getenv("SUMMARY_SHARED_PREFIX", "true").lower() == "true"
+    SUMMARY_FAST_TOKENIZER = os.getenv("SUMMARY_FAST_TOKENIZER", "true").lower() == "true"
+    # Long meetings: transcripts above SUMMARY_CONTEXT_TOKENS are condensed window by window first
+    SUMMARY_MAP_REDUCE = os.getenv("SUMMARY_MAP_REDUCE", "true").lower() == "true"
+    SUMMARY_CONTEXT_TOKENS = int(os.getenv("SUMMARY_CONTEXT_TOKENS", "6000"))
+    SUMMARY_WINDOW_TOKENS = int(os.getenv("SUMMARY_WINDOW_TOKENS", "2000"))
+    SUMMARY_MAP_BATCH_SIZE = int(os.getenv("SUMMARY_MAP_BATCH_SIZE", "4"))
+    SUMMARY_MAP_MAX_NEW_TOKENS = int(os.getenv("SUMMARY_MAP_MAX_NEW_TOKENS", "300"))
+    # Generation budgets: a share of the transcript's tokens, clamped per task
+    SUMMARY_NEW_TOKENS_RATIO = float(os.getenv("SUMMARY_NEW_TOKENS_RATIO", "0.5"))
+    SUMMARY_MIN_NEW_TOKENS = int(os.getenv("SUMMARY_MIN_NEW_TOKENS", "300"))
+    SUMMARY_MAX_NEW_TOKENS = int(os.getenv("SUMMARY_MAX_NEW_TOKENS", "1000"))
+    ACTION_ITEMS_MIN_NEW_TOKENS = int(os.getenv("ACTION_ITEMS_MIN_NEW_TOKENS", "150"))
+    ACTION_ITEMS_MAX_NEW_TOKENS = int(os.getenv("ACTION_ITEMS_MAX_NEW_TOKENS", "700"))
+    # Cache of window notes and results, so repeated calls on a growing meeting only process new entries.
+    # Window notes only exist above SUMMARY_CONTEXT_TOKENS; shorter transcripts are summarized in one
+    # pass, so a changed one is regenerated in full and only an identical one hits the cache
+    SUMMARY_CACHE_ENABLED = os.getenv("SUMMARY_CACHE_ENABLED", "true").lower() == "true"
+    SUMMARY_CACHE_DIR = os.getenv(
+        "SUMMARY_CACHE_DIR", os.path.join(tempfile.gettempdir(), "barta_summary_cache")
+    )
+    SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    # Per-utterance sentiment, batched by token budget on CPU
+    SENTIMENT_MODEL = os.getenv("SENTIMENT_MODEL", "lxyuan/distilbert-base-multilingual-cased-sentiments-student")
+    SENTIMENT_DEVICE = os.getenv("SENTIMENT_DEVICE", "cpu")
+    SENTIMENT_INT8 = os.getenv("SENTIMENT_INT8", "true").lower() == "true"
+    SENTIMENT_MAX_BATCH_TOKENS = int(os.getenv("SENTIMENT_MAX_BATCH_TOKENS", "4096"))
+    SENTIMENT_MAX_LENGTH = int(os.getenv("SENTIMENT_MAX_LENGTH", "128"))
+    SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "10000"))
+    SENTIMENT_CACHE_MAX_CHARS = int(os.getenv("SENTIMENT_CACHE_MAX_CHARS", "200"))
+
 settings = Settings()
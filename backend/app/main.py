@@ -1,7 +1,41 @@
-from fastapi import FastAPI
+import threading
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.api.routes import api_router
 from app.core.config import settings
+from app.services.registry import engine_registry
+from app.services.job_service import job_manager
+from app.services.admission import AdmissionRejected, admission_controllers
+from app.services.live_transcription import live_executor
+from app.utils.process_pool import audio_process_pool
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Refuse requests whose declared Content-Length is over the upload limit with 413,
+    before the body is read and spooled. Plain ASGI so streamed responses pass untouched.
+    """
+
+    # Multipart framing on top of the file itself
+    overhead_bytes = 1024 * 1024
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.max_bytes:
+            content_length = dict(scope["headers"]).get(b"content-length", b"")
+            if content_length.isdigit() and int(content_length) > self.max_bytes + self.overhead_bytes:
+                response = JSONResponse(
+                    status_code=413,
+                    content={"detail": f"Upload exceeds the limit of {self.max_bytes} bytes"}
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
 
 app = FastAPI()
 
@@ -14,9 +48,49 @@ app.add_middleware(
     allow_headers=settings.ALLOW_HEADERS,
 )
 
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=settings.UPLOAD_MAX_BYTES)
+
 # Register routes
 app.include_router(api_router)
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    # Over capacity: tell the client when the backlog should have drained
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.on_event("startup")
+async def warmup_engines():
+    # Load configured engines in the background so the worker starts serving right away
+    if settings.WARMUP_ENGINES:
+        threading.Thread(
+            target=engine_registry.warmup,
+            args=(settings.WARMUP_ENGINES,),
+            name="engine-warmup",
+            daemon=True
+        ).start()
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    job_manager.shutdown()
+    audio_process_pool.shutdown()
+    live_executor.shutdown(wait=False, cancel_futures=True)
+
+@app.get("/engines")
+async def engine_status():
+    return engine_registry.status()
+
+@app.get("/admission")
+async def admission_status():
+    # Queue depth, cost in flight and rejections per endpoint, plus the job backlog
+    return {
+        **{name: controller.stats() for name, controller in admission_controllers.items()},
+        "jobs": job_manager.stats(),
+    }
@@ -0,0 +1,250 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't be queued (or waited too long); maps to 429."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A request's place in an admission queue, holding `cost` units once granted."""
+
+    def __init__(self, cost: float):
+        self.cost = cost
+        self.enqueued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self.released = False
+        self._event = threading.Event()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def granted(self) -> bool:
+        return self.granted_at is not None
+
+
+class AdmissionController:
+    """
+    Cost-based admission control for one kind of work.
+
+    Requests declare an estimated cost (audio seconds, transcript tokens). Up to
+    `capacity` units run at once; the rest wait in a FIFO queue of at most
+    `max_queue` requests, and anything beyond that is rejected with a Retry-After
+    estimate drawn from recent service times. A request costing more than the whole
+    capacity is admitted alone. `capacity` 0 disables the limit.
+
+    Thread-safe: tickets can be awaited from the event loop or waited on from
+    worker threads, and released from either.
+    """
+
+    def __init__(self, name: str, capacity: float, max_queue: int, max_wait: float):
+        self.name = name
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.queue: Deque[Ticket] = deque()
+        self.in_flight = 0
+        self.in_flight_cost = 0.0
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self.timed_out_total = 0
+        self.total_wait = 0.0
+        # Moving average of seconds of service per unit of cost, for Retry-After
+        self.seconds_per_unit: Optional[float] = None
+
+    def enqueue(self, cost: float) -> Ticket:
+        """
+        Take a place for a request of `cost` units: granted right away when it fits,
+        queued otherwise. Raises AdmissionRejected when the queue is full.
+        """
+        ticket = Ticket(min(cost, self.capacity) if self.capacity > 0 else cost)
+        with self.lock:
+            if self.capacity <= 0 or (not self.queue and self.in_flight_cost + ticket.cost <= self.capacity):
+                self._grant(ticket)
+            elif len(self.queue) >= self.max_queue:
+                self.rejected_total += 1
+                raise AdmissionRejected(
+                    f"Too many {self.name} requests in progress, try again later",
+                    self._retry_after()
+                )
+            else:
+                self.queue.append(ticket)
+        return ticket
+
+    def wait(self, ticket: Ticket, timeout: Optional[float] = None):
+        """
+        Block the calling thread until the ticket is granted.
+        """
+        if not ticket._event.wait(timeout):
+            self._time_out(ticket)
+
+    async def wait_async(self, ticket: Ticket, timeout: Optional[float] = None):
+        """
+        Wait on the event loop until the ticket is granted.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.lock:
+            if ticket.granted:
+                return
+            ticket._waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._time_out(ticket)
+
+    def release(self, ticket: Ticket):
+        """
+        Give back a granted ticket's units, or leave the queue if it was still waiting.
+        """
+        with self.lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket.granted:
+                self.in_flight -= 1
+                self.in_flight_cost -= ticket.cost
+                self._record_service(ticket)
+            elif ticket in self.queue:
+                self.queue.remove(ticket)
+            self._drain()
+
+    def resize(self, ticket: Ticket, cost: float):
+        """
+        Change a ticket's cost once the request's real size is known, e.g. the probed
+        duration of an upload that was admitted on its Content-Length.
+        """
+        with self.lock:
+            if ticket.released:
+                return
+            cost = min(cost, self.capacity) if self.capacity > 0 else cost
+            if ticket.granted:
+                self.in_flight_cost += cost - ticket.cost
+            ticket.cost = cost
+            self._drain()
+
+    @asynccontextmanager
+    async def admitted(self, cost: float):
+        """
+        Hold `cost` units for the duration of the block, waiting up to `max_wait`
+        seconds in the queue. Raises AdmissionRejected when full or timed out.
+        """
+        ticket = self.enqueue(cost)
+        try:
+            await self.wait_async(ticket, self.max_wait)
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def _time_out(self, ticket: Ticket):
+        with self.lock:
+            if ticket.granted:
+                # Granted just as the wait ran out, keep it
+                return
+            self.timed_out_total += 1
+        self.release(ticket)
+        raise AdmissionRejected(
+            f"Timed out waiting for {self.name} capacity, try again later",
+            self._retry_after()
+        )
+
+    def _grant(self, ticket: Ticket):
+        # Callers hold self.lock
+        ticket.granted_at = time.monotonic()
+        self.in_flight += 1
+        self.in_flight_cost += ticket.cost
+        self.admitted_total += 1
+        self.total_wait += ticket.granted_at - ticket.enqueued_at
+        ticket._event.set()
+        for loop, future in ticket._waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def _drain(self):
+        # Strict FIFO: a large request at the head is never overtaken and starved
+        while self.queue and (
+            self.in_flight == 0 or self.in_flight_cost + self.queue[0].cost <= self.capacity
+        ):
+            self._grant(self.queue.popleft())
+
+    def _record_service(self, ticket: Ticket):
+        if ticket.cost <= 0:
+            return
+        sample = (time.monotonic() - ticket.granted_at) / ticket.cost
+        if self.seconds_per_unit is None:
+            self.seconds_per_unit = sample
+        else:
+            self.seconds_per_unit = 0.8 * self.seconds_per_unit + 0.2 * sample
+
+    def _retry_after(self) -> int:
+        """
+        Seconds until the current backlog has likely drained: everything in flight
+        and queued, with each running request getting through 1 / seconds_per_unit
+        units per second.
+        """
+        if self.seconds_per_unit is None or self.capacity <= 0:
+            return settings.ADMISSION_DEFAULT_RETRY_AFTER_SECONDS
+        backlog = self.in_flight_cost + sum(ticket.cost for ticket in self.queue)
+        estimate = backlog * self.seconds_per_unit / max(self.in_flight, 1)
+        return int(min(max(math.ceil(estimate), 1), settings.ADMISSION_MAX_RETRY_AFTER_SECONDS))
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "capacity": self.capacity,
+                "in_flight": self.in_flight,
+                "in_flight_cost": round(self.in_flight_cost, 2),
+                "queued": len(self.queue),
+                "queued_cost": round(sum(ticket.cost for ticket in self.queue), 2),
+                "max_queue": self.max_queue,
+                "admitted": self.admitted_total,
+                "rejected": self.rejected_total,
+                "timed_out": self.timed_out_total,
+                "avg_wait_seconds": round(self.total_wait / self.admitted_total, 3) if self.admitted_total else 0.0,
+                "seconds_per_unit": self.seconds_per_unit,
+            }
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+# Google transcription: cost is seconds of audio
+google_admission = AdmissionController(
+    "transcription",
+    settings.ADMISSION_GOOGLE_CAPACITY_SECONDS,
+    settings.ADMISSION_GOOGLE_MAX_QUEUE,
+    settings.ADMISSION_MAX_WAIT_SECONDS
+)
+# Meeting summaries: cost is transcript tokens
+summary_admission = AdmissionController(
+    "summary",
+    settings.ADMISSION_SUMMARY_CAPACITY_TOKENS,
+    settings.ADMISSION_SUMMARY_MAX_QUEUE,
+    settings.ADMISSION_MAX_WAIT_SECONDS
+)
+
+# Live WebSocket transcription: cost is one per session, held for the whole meeting
+live_admission = AdmissionController(
+    "live transcription",
+    settings.LIVE_MAX_SESSIONS,
+    settings.LIVE_MAX_QUEUE,
+    settings.ADMISSION_MAX_WAIT_SECONDS
+)
+
+admission_controllers = {
+    "google": google_admission,
+    "summary": summary_admission,
+    "live": live_admission,
+}
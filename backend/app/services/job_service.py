@@ -0,0 +1,171 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+
+class TranscriptionJob:
+    def __init__(self, job_id: str, kind: str):
+        self.job_id = job_id
+        self.kind = kind
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = "Waiting for a free worker"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Bumped on every change so event subscribers can tell when to push an update
+        self.version = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        data = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": round(self.progress, 4),
+            "message": self.message,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        if include_result and self.status == "completed":
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """
+    Run long transcription work on a bounded pool of worker threads and keep
+    track of its progress so clients can poll or subscribe for updates.
+    """
+
+    def __init__(self, max_workers: int = None, result_ttl: int = None):
+        self.max_workers = max_workers or settings.TRANSCRIPTION_WORKERS
+        self.result_ttl = result_ttl if result_ttl is not None else settings.JOB_RESULT_TTL_SECONDS
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="transcription-job"
+        )
+        self.jobs: Dict[str, TranscriptionJob] = {}
+        self.lock = threading.Lock()
+
+    def submit(
+        self,
+        kind: str,
+        func: Callable[..., Any],
+        *args,
+        on_finish: Optional[Callable[[], None]] = None,
+        **kwargs
+    ) -> TranscriptionJob:
+        """
+        Queue `func` on the worker pool. The function receives a `progress_callback`
+        keyword argument it can call with (fraction, message) while it runs.
+        `on_finish` is always called once the job is done, e.g. to remove temp files.
+        If the job can't be queued (e.g. after `shutdown`) this raises, the job is
+        forgotten and `on_finish` is not called.
+        """
+        self._purge_expired()
+
+        job = TranscriptionJob(uuid.uuid4().hex, kind)
+        with self.lock:
+            self.jobs[job.job_id] = job
+
+        def progress_callback(fraction: float, message: str = ""):
+            self._update(job, progress=min(max(fraction, 0.0), 1.0), message=message or job.message)
+
+        def run():
+            self._update(job, status="running", started_at=time.time(), message="Processing")
+            try:
+                result = func(*args, progress_callback=progress_callback, **kwargs)
+                self._update(
+                    job,
+                    status="completed",
+                    result=result,
+                    progress=1.0,
+                    message="Completed",
+                    finished_at=time.time()
+                )
+            except Exception as e:
+                print(f"Job {job.job_id} failed: {str(e)}")
+                self._update(
+                    job,
+                    status="failed",
+                    error=str(e),
+                    message="Failed",
+                    finished_at=time.time()
+                )
+            finally:
+                if on_finish is not None:
+                    try:
+                        on_finish()
+                    except Exception as e:
+                        print(f"Job {job.job_id} cleanup failed: {str(e)}")
+
+        try:
+            self.executor.submit(run)
+        except Exception:
+            # Never queued, don't leave it "queued" forever
+            with self.lock:
+                self.jobs.pop(job.job_id, None)
+            raise
+        return job
+
+    def get(self, job_id: str) -> Optional[TranscriptionJob]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def snapshot(self, job_id: str, include_result: bool = True) -> Optional[Dict]:
+        """
+        Return a consistent copy of the job state, or None if the job is unknown.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            data = job.to_dict(include_result=include_result)
+            data["version"] = job.version
+            data["finished"] = job.finished
+            return data
+
+    def stats(self) -> Dict:
+        with self.lock:
+            counts: Dict[str, int] = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.max_workers, "jobs": counts}
+
+    def _update(self, job: TranscriptionJob, **changes):
+        with self.lock:
+            for key, value in changes.items():
+                setattr(job, key, value)
+            job.version += 1
+
+    def _purge_expired(self):
+        """
+        Forget finished jobs once their result has been kept for `result_ttl` seconds.
+        """
+        cutoff = time.time() - self.result_ttl
+        with self.lock:
+            expired = [
+                job_id for job_id, job in self.jobs.items()
+                if job.finished and job.finished_at is not None and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self.jobs[job_id]
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+job_manager = JobManager()
@@ -0,0 +1,225 @@
+import concurrent.futures
+import math
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.transcription_google import GoogleTranscriptionService, SAMPLE_RATE, BYTES_PER_SAMPLE
+from app.utils.silence_detection import split_on_silence
+
+# Recognition workers shared by every live session, so concurrent meetings queue for
+# the same GOOGLE_CHUNK_CONCURRENCY requests instead of each adding its own
+live_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=settings.GOOGLE_CHUNK_CONCURRENCY,
+    thread_name_prefix="live-chunk"
+)
+
+
+class LiveTranscriptionSession:
+    """
+    Incremental Google transcription of a PCM stream (16 kHz mono LINEAR16) that
+    arrives while the meeting is going on.
+
+    Incoming audio is kept in a buffer that starts at the first sample not yet
+    sent for recognition. Every `split_interval` seconds of new audio the buffer is
+    split on silence with the same parameters as whole-file transcription; chunks
+    that are followed by silence (or by another chunk) are closed, packed into
+    windows and recognized in the background, and the buffer is cut after them.
+    Speech running longer than the service's window limit without a pause is
+    closed at the buffer end.
+
+    Words come back in window order and are grouped with `build_phrases`. A phrase
+    is final once no word can follow it within the pause threshold, i.e. it ended
+    more than the threshold before the earliest audio still being recognized or
+    buffered, so phrases are pushed a moment after the speaker pauses.
+    """
+
+    def __init__(
+        self,
+        service: GoogleTranscriptionService,
+        language_code: str = "bn-BD",
+        on_update: Optional[Callable[[], None]] = None,
+        split_interval: float = None,
+        pause_threshold: float = 0.4,
+        executor: Optional[concurrent.futures.Executor] = None
+    ):
+        """
+        Args:
+            service: Google service whose client, silence parameters and window limit are used
+            language_code: Language code for transcription
+            on_update: Called from a worker thread whenever a window's words arrive,
+                e.g. to wake up whoever calls `poll`
+            split_interval: Seconds of new audio between silence splits of the buffer
+            pause_threshold: Pause that ends a phrase, as in `build_phrases`
+            executor: Runs the recognition requests, `live_executor` by default
+        """
+        self.service = service
+        self.language_code = language_code
+        self.on_update = on_update
+        self.split_samples = int((split_interval or settings.LIVE_SPLIT_INTERVAL_SECONDS) * SAMPLE_RATE)
+        self.pause_threshold = pause_threshold
+        self.max_open_samples = int(service.max_window_seconds * SAMPLE_RATE)
+        # Audio kept when nothing is audible: enough for a silence window plus the padding of the next chunk
+        params = service.silence_params
+        self.lookback_samples = (params["min_silence_len"] + params["keep_silence"]) * SAMPLE_RATE // 1000
+
+        self.lock = threading.Lock()
+        self.buffer = np.empty(0, dtype=np.int16)
+        self.buffer_start = 0  # Position of buffer[0] in the stream, in samples
+        # Frames fed since the last split, joined onto the buffer only when it is split
+        self.frames: List[np.ndarray] = []
+        self.unsplit = 0
+        self.remainder = b""
+        self.finished = False
+
+        self.executor = executor or live_executor
+        # Windows being recognized, in stream order: (start in seconds, future of words)
+        self.windows: Deque[Tuple[float, concurrent.futures.Future]] = deque()
+        self.pending_words: List[Dict] = []
+        self.transcript: List[Dict] = []
+
+    @property
+    def complete(self) -> bool:
+        """True once `finish` ran and every phrase has been returned by `poll`."""
+        with self.lock:
+            return self.finished and not self.windows and not self.pending_words
+
+    def feed(self, data: bytes):
+        """
+        Add raw little-endian 16-bit PCM. Frames need not be aligned to samples.
+        """
+        with self.lock:
+            if self.finished:
+                raise Exception("Live transcription session already finished")
+            data = self.remainder + data
+            usable = len(data) - len(data) % BYTES_PER_SAMPLE
+            self.remainder = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype="<i2")
+
+            self.frames.append(samples)
+            self.unsplit += len(samples)
+            if self.unsplit >= self.split_samples:
+                self.unsplit = 0
+                self._close_chunks(final=False)
+
+    def finish(self):
+        """
+        End of the stream: close the remaining audio and wait until all of it is recognized.
+        """
+        with self.lock:
+            if not self.finished:
+                self.finished = True
+                self._close_chunks(final=True)
+            futures = [future for _, future in self.windows]
+        concurrent.futures.wait(futures)
+
+    def poll(self) -> List[Dict]:
+        """
+        Phrases that became final since the last call, with formatted timestamps.
+        Raises if recognition of a window failed.
+        """
+        with self.lock:
+            while self.windows and self.windows[0][1].done():
+                _, future = self.windows.popleft()
+                self.pending_words.extend(future.result())
+
+            if not self.pending_words:
+                return []
+
+            # Every word not collected yet starts at or after the horizon
+            if self.windows:
+                horizon = self.windows[0][0]
+            elif self.finished:
+                horizon = math.inf
+            else:
+                horizon = self.buffer_start / SAMPLE_RATE
+
+            phrases = self.service.build_phrases(self.pending_words, self.pause_threshold)
+            last = phrases[-1]
+            if horizon - last["end"] > self.pause_threshold:
+                self.pending_words = []
+            else:
+                # The last phrase may still grow, keep its words for the next round
+                phrases.pop()
+                self.pending_words = [word for word in self.pending_words if word["start"] >= last["start"]]
+
+            final = [
+                {
+                    "start": self.service.format_timestamp(phrase["start"]),
+                    "end": self.service.format_timestamp(phrase["end"]),
+                    "text": phrase["text"]
+                }
+                for phrase in phrases
+            ]
+            self.transcript.extend(final)
+            return final
+
+    def close(self):
+        """
+        Drop the windows whose recognition hasn't started yet.
+        """
+        with self.lock:
+            for _, future in self.windows:
+                future.cancel()
+
+    def _close_chunks(self, final: bool):
+        # Callers hold self.lock
+        if self.frames:
+            self.buffer = np.concatenate([self.buffer] + self.frames)
+            self.frames = []
+        n = len(self.buffer)
+        if n == 0:
+            return
+        starts, ends = split_on_silence(self.buffer, SAMPLE_RATE, **self.service.silence_params)
+        starts, ends = starts.tolist(), ends.tolist()
+
+        # A chunk is closed once another chunk or trailing silence follows it
+        closed = len(starts) if final or (starts and ends[-1] < n) else max(len(starts) - 1, 0)
+        ranges = list(zip(starts[:closed], ends[:closed]))
+
+        if closed < len(starts):
+            if n - starts[closed] >= self.max_open_samples:
+                # No pause for a whole window: close what there is and continue after it
+                ranges.append((starts[closed], n))
+                cut = n
+            else:
+                cut = starts[closed]
+        elif ranges:
+            cut = ends[-1]
+        else:
+            cut = max(n - self.lookback_samples, 0)
+        if final:
+            cut = n
+
+        if ranges:
+            self._submit(ranges)
+        self.buffer = self.buffer[cut:]
+        self.buffer_start += cut
+        if cut and self.pending_words and self.on_update is not None:
+            # The horizon moved, a held back phrase may be final now
+            self.on_update()
+
+    def _submit(self, ranges: List[Tuple[int, int]]):
+        # Pack with stream positions so offsets map words onto the meeting timeline
+        offset = self.buffer_start
+        pcm = memoryview(self.buffer).cast("B")
+        windows = self.service.pack_chunks([(start + offset, end + offset) for start, end in ranges])
+
+        for window in windows:
+            audio_content = b"".join(
+                pcm[(start - offset) * BYTES_PER_SAMPLE:(end - offset) * BYTES_PER_SAMPLE]
+                for start, end in window["ranges"]
+            )
+            future = self.executor.submit(
+                self.service.transcribe_chunk_with_retry,
+                audio_content,
+                window["start"],
+                self.language_code,
+                window["offsets"]
+            )
+            if self.on_update is not None:
+                future.add_done_callback(lambda _: self.on_update())
+            self.windows.append((window["start"], future))
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from app.core.config import settings
+
+
+class EngineUnavailableError(Exception):
+    """Raised when an engine is requested that is unknown or disabled by config."""
+
+
+def _current_rss_bytes() -> int:
+    """
+    Resident set size of this process, or 0 where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class EngineRegistry:
+    """
+    Thread-safe registry of lazily constructed engines (ASR services, models, pipelines).
+
+    Nothing is built at import time. An engine is constructed on its first `get` or on
+    an explicit `warmup`. Concurrent first callers wait for the same load, and the
+    registry records how long each load took and how much memory it added.
+    """
+
+    def __init__(self, enabled: Optional[Iterable[str]] = None):
+        self.enabled = set(enabled) if enabled is not None else None
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._engines: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        with self._lock:
+            self._factories[name] = factory
+            self._locks[name] = threading.Lock()
+
+    def is_enabled(self, name: str) -> bool:
+        return name in self._factories and (self.enabled is None or name in self.enabled)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._engines
+
+    def get(self, name: str) -> Any:
+        engine = self._engines.get(name)
+        if engine is not None:
+            return engine
+
+        if not self.is_enabled(name):
+            raise EngineUnavailableError(f"Engine '{name}' is not enabled on this server")
+
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited for the lock
+            engine = self._engines.get(name)
+            if engine is not None:
+                return engine
+
+            print(f"Loading engine '{name}'...")
+            rss_before = _current_rss_bytes()
+            started = time.perf_counter()
+            try:
+                engine = self._factories[name]()
+            except Exception as e:
+                self._stats[name] = {"status": "failed", "error": str(e)}
+                raise Exception(f"Failed to load engine '{name}': {str(e)}")
+
+            load_seconds = time.perf_counter() - started
+            rss_delta = max(_current_rss_bytes() - rss_before, 0)
+            self._stats[name] = {
+                "status": "loaded",
+                "load_seconds": round(load_seconds, 3),
+                "memory_bytes": rss_delta,
+                "loaded_at": time.time(),
+            }
+            self._engines[name] = engine
+            print(f"Engine '{name}' loaded in {load_seconds:.2f}s (+{rss_delta / 2**20:.1f} MiB)")
+            return engine
+
+    def warmup(self, names: Optional[Iterable[str]] = None):
+        """
+        Load the given engines (default: every enabled engine) ahead of the first request.
+        Failures are logged, not raised, so one broken engine doesn't block the rest.
+        """
+        names = list(names) if names is not None else [name for name in self._factories if self.is_enabled(name)]
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Warmup of engine '{name}' failed: {str(e)}")
+
+    def status(self) -> Dict:
+        return {
+            name: {
+                "enabled": self.is_enabled(name),
+                **self._stats.get(name, {"status": "loaded" if name in self._engines else "not_loaded"}),
+            }
+            for name in self._factories
+        }
+
+
+def _whisper():
+    from app.services.transcription_whisper import WhisperTranscriptionService
+    return WhisperTranscriptionService()
+
+
+def _wav2vec():
+    from app.services.transcription_wav2vec import Wav2Vec2TranscriptionService
+    return Wav2Vec2TranscriptionService()
+
+
+def _google():
+    from app.services.transcription_google import GoogleTranscriptionService
+    return GoogleTranscriptionService()
+
+
+def _preprocessor():
+    from app.utils.audio_preprocessing import AudioPreprocessor
+    return AudioPreprocessor()
+
+
+def _summary_model():
+    from app.services.summaryTask_service import load_summary_model
+    return load_summary_model()
+
+
+def _sentiment():
+    from app.services.sentiment_service import SentimentService
+    return SentimentService()
+
+
+engine_registry = EngineRegistry(enabled=settings.ENABLED_ENGINES)
+engine_registry.register("whisper", _whisper)
+engine_registry.register("wav2vec", _wav2vec)
+engine_registry.register("google", _google)
+engine_registry.register("preprocessor", _preprocessor)
+engine_registry.register("summary", _summary_model)
+engine_registry.register("sentiment", _sentiment)
@@ -0,0 +1,138 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from app.core.config import settings
+
+
+class SentimentService:
+    """
+    Per-utterance sentiment classifier for meeting transcripts.
+
+    Utterances are deduplicated, sorted by token length and classified in batches
+    sized by a token budget, so short lines are not padded to the longest one.
+    Results for short utterances ("ঠিক আছে", "হ্যাঁ", ...) are kept in an LRU cache
+    and reused across requests.
+    """
+
+    def __init__(
+        self,
+        model_name: str = None,
+        device: str = None,
+        max_batch_tokens: int = None,
+        max_length: int = None,
+        cache_size: int = None,
+        cache_max_chars: int = None,
+    ):
+        self.model_name = model_name or settings.SENTIMENT_MODEL
+        self.device = torch.device(device or settings.SENTIMENT_DEVICE)
+        self.max_batch_tokens = max_batch_tokens or settings.SENTIMENT_MAX_BATCH_TOKENS
+        self.max_length = max_length or settings.SENTIMENT_MAX_LENGTH
+        self.cache_size = settings.SENTIMENT_CACHE_SIZE if cache_size is None else cache_size
+        self.cache_max_chars = cache_max_chars or settings.SENTIMENT_CACHE_MAX_CHARS
+
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._load_model()
+
+    def _load_model(self):
+        print("Loading sentiment model...")
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, use_fast=True)
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_name).eval()
+        if self.device.type == "cpu" and settings.SENTIMENT_INT8:
+            # Dynamic int8 Linear layers: a few times faster on CPU for the same labels
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model.to(self.device)
+        self.labels = self.model.config.id2label
+        print("Sentiment model loaded successfully")
+
+    def _cache_get(self, text: str) -> Optional[str]:
+        with self._cache_lock:
+            label = self._cache.get(text)
+            if label is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(text)
+            self.hits += 1
+            return label
+
+    def _cache_put(self, text: str, label: str):
+        if len(text) > self.cache_max_chars or self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[text] = label
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _make_batches(self, lengths: List[int]) -> List[List[int]]:
+        """
+        Group indices sorted by length so that every batch, padded to its longest
+        member, stays within `max_batch_tokens`.
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        batches, batch = [], []
+        for i in order:
+            # Sorted ascending, so the newest member sets the padded length
+            if batch and lengths[i] * (len(batch) + 1) > self.max_batch_tokens:
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _classify_uncached(self, texts: List[str]) -> List[str]:
+        encodings = self.tokenizer(texts, truncation=True, max_length=self.max_length)
+        lengths = [len(ids) for ids in encodings["input_ids"]]
+        labels = [None] * len(texts)
+
+        with torch.inference_mode():
+            for batch in self._make_batches(lengths):
+                features = self.tokenizer.pad(
+                    {key: [encodings[key][i] for i in batch] for key in encodings.keys()},
+                    return_tensors="pt"
+                ).to(self.device)
+                predictions = self.model(**features).logits.argmax(dim=-1).tolist()
+                for i, prediction in zip(batch, predictions):
+                    labels[i] = self.labels[prediction]
+
+        return labels
+
+    def classify(self, texts: List[str]) -> List[Optional[str]]:
+        """
+        Sentiment label for every text, in order. Blank texts get None.
+        """
+        results: Dict[str, Optional[str]] = {}
+        pending = []
+        for text in texts:
+            key = text.strip()
+            if key in results:
+                continue
+            results[key] = self._cache_get(key) if key else None
+            if key and results[key] is None:
+                pending.append(key)
+
+        if pending:
+            for key, label in zip(pending, self._classify_uncached(pending)):
+                results[key] = label
+                self._cache_put(key, label)
+
+        return [results[text.strip()] for text in texts]
+
+    def stats(self) -> Dict:
+        with self._cache_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._cache),
+                "max_size": self.cache_size,
+            }
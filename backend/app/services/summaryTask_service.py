@@ -1,36 +1,104 @@
 import re
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
-from transformers import BitsAndBytesConfig
-import torch
-
-# Step 5: Sentiment Analysis using specialized model
-sentiment_analyzer = pipeline(
-    "text-classification",
-    model="lxyuan/distilbert-base-multilingual-cased-sentiments-student",
-    device=0  # Use GPU
-)
+import copy
+import json
+import hashlib
+import functools
+from app.core.config import settings
+from app.services.registry import engine_registry
+from app.utils.transcript_cache import TranscriptCache
 
-# Step 6: Action Item Generation using Mistral-7B
-quantization_config = BitsAndBytesConfig(
-    load_in_4bit=True,
-    bnb_4bit_compute_dtype=torch.float16,
-    bnb_4bit_quant_type="nf4"
-)
+MODEL_NAME = "mistralai/Mistral-7B-Instruct-v0.3"
+
+SUMMARY_SECTIONS = [
+    "প্রধান আলোচ্য বিষয়",
+    "গৃহীত সিদ্ধান্তসমূহ",
+    "সামগ্রিক অনুভূতি",
+    "অংশগ্রহণকারীদের সম্পৃক্ততা বিশ্লেষণ"
+]
+
+# Prompts for the shared-prefix mode: the transcript comes first so both tasks can
+# reuse its prefilled KV cache, and each task only adds its own instruction suffix.
+SHARED_PREFIX_PROMPT = """<s>[INST] 
+নিচে একটি মিটিং ট্রান্সক্রিপ্ট দেওয়া হলো:
+{transcript_text}
+
+"""
+
+SUMMARY_SUFFIX = """উপরের মিটিং ট্রান্সক্রিপ্ট বিশ্লেষণ করে একটি বিস্তারিত সারাংশ তৈরি করুন বাংলা ভাষায়।
+
+সারাংশে নিম্নলিখিত বিষয়গুলি অন্তর্ভুক্ত করুন:
+১. প্রধান আলোচ্য বিষয়
+২. গৃহীত সিদ্ধান্তসমূহ
+৩. সামগ্রিক অনুভূতি (ইতিবাচক/নিরপেক্ষ/নেতিবাচক) সাথে আত্মবিশ্বাস স্কোর
+৪. অংশগ্রহণকারীদের সম্পৃক্ততা বিশ্লেষণ
+
+উত্তর অবশ্যই বাংলায় এবং ইউনিকোডে লিখতে হবে। [/INST]"""
+
+ACTION_ITEMS_SUFFIX = """উপরের মিটিং ট্রান্সক্রিপ্ট বিশ্লেষণ করে কর্মপরিকল্পনা তৈরি করুন বাংলা ভাষায়।
 
-from transformers import AutoTokenizer
-
-tokenizer = AutoTokenizer.from_pretrained("mistralai/Mistral-7B-Instruct-v0.3", use_fast=False, trust_remote_code=True)
-model = AutoModelForCausalLM.from_pretrained(
-    "mistralai/Mistral-7B-Instruct-v0.3",
-    device_map="auto",
-    quantization_config=quantization_config,
-    do_sample=True,
-    top_p=0.95,
-    temperature=0.3,
-    repetition_penalty=1.15
+ফরম্যাট:
+- কর্মপরিকল্পনা: [বিবরণ]
+  দায়িত্বপ্রাপ্ত: [ব্যক্তি]
+  সময়সীমা: [সময়]
+  
+কেবলমাত্র বাস্তব কর্মপরিকল্পনা অন্তর্ভুক্ত করুন। উত্তর বাংলাতেই দিন। [/INST]"""
+
+# Map step of the long-meeting mode: condense one window of the transcript into notes
+WINDOW_NOTES_PROMPT = """<s>[INST] 
+নিচে একটি দীর্ঘ মিটিংয়ের একটি অংশের ট্রান্সক্রিপ্ট দেওয়া হলো:
+{window_text}
+
+এই অংশের সংক্ষিপ্ত নোট লিখুন বাংলা ভাষায়। আলোচ্য বিষয়, গৃহীত সিদ্ধান্ত, অংশগ্রহণকারীদের মনোভাব ও সম্পৃক্ততা,
+এবং কর্মপরিকল্পনা (দায়িত্বপ্রাপ্ত ব্যক্তি ও সময়সীমা সহ) অবশ্যই উল্লেখ করুন। [/INST]"""
+
+# Window notes and final results are cached by content, so a growing meeting only pays for new entries
+summary_cache = (
+    TranscriptCache(settings.SUMMARY_CACHE_DIR, settings.SUMMARY_CACHE_MAX_BYTES)
+    if settings.SUMMARY_CACHE_ENABLED else None
 )
 
-def generate_action_items_array(transcript_text):
+@functools.lru_cache(maxsize=1)
+def load_summary_tokenizer():
+    """
+    Tokenizer of the summary model, loaded once and on its own so token counts
+    (e.g. admission cost estimates) don't need the model in memory.
+    """
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(
+        MODEL_NAME,
+        use_fast=settings.SUMMARY_FAST_TOKENIZER,
+        trust_remote_code=True
+    )
+
+def load_summary_model():
+    import torch
+    from transformers import AutoModelForCausalLM, BitsAndBytesConfig
+
+    # Step 6: Action Item Generation using Mistral-7B
+    quantization_config = BitsAndBytesConfig(
+        load_in_4bit=True,
+        bnb_4bit_compute_dtype=torch.float16,
+        bnb_4bit_quant_type="nf4"
+    )
+
+    tokenizer = load_summary_tokenizer()
+    # Batched generation needs a pad token, and padding on the left so every prompt ends at the same position
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"
+    model = AutoModelForCausalLM.from_pretrained(
+        MODEL_NAME,
+        device_map="auto",
+        quantization_config=quantization_config,
+        do_sample=True,
+        top_p=0.95,
+        temperature=0.3,
+        repetition_penalty=1.15
+    )
+    return tokenizer, model
+
+def generate_action_items_array(transcript_text, streamer=None, stop=None):
     prompt = f"""<s>[INST] 
 নিচের মিটিং ট্রান্সক্রিপ্ট বিশ্লেষণ করে কর্মপরিকল্পনা তৈরি করুন বাংলা ভাষায়:
 {transcript_text}
@@ -42,17 +110,33 @@ def generate_action_items_array(transcript_text):
   
 কেবলমাত্র বাস্তব কর্মপরিকল্পনা অন্তর্ভুক্ত করুন। উত্তর বাংলাতেই দিন। [/INST]"""
     
-    inputs = tokenizer(prompt, return_tensors="pt").to("cuda")
-    outputs = model.generate(**inputs, max_new_tokens=700)
-    action_items = tokenizer.decode(outputs[0], skip_special_tokens=True)
+    tokenizer, model = engine_registry.get("summary")
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    prompt_length = inputs.input_ids.shape[-1]
+    budget = generation_budget(
+        count_tokens([transcript_text])[0],
+        settings.ACTION_ITEMS_MIN_NEW_TOKENS,
+        settings.ACTION_ITEMS_MAX_NEW_TOKENS
+    )
+    outputs = model.generate(
+        **inputs,
+        max_new_tokens=budget,
+        stopping_criteria=build_stopping_criteria(tokenizer, prompt_length, stop=stop),
+        streamer=streamer
+    )
+    # Decode only the new tokens, the echoed prompt would otherwise be split into items too
+    action_items = tokenizer.decode(outputs[0][prompt_length:], skip_special_tokens=True)
+
+    return split_action_items(action_items)
 
+def split_action_items(action_items):
     # Split action items into an array by newlines
     action_items_array = re.split(r"\n- ", action_items)
     action_items_array = [item.strip() for item in action_items_array if item.strip()]
     
     return action_items_array
 
-def generate_meeting_summary_array(transcript_text):
+def generate_meeting_summary_array(transcript_text, streamer=None, stop=None):
     prompt = f"""<s>[INST] 
 মিটিং ট্রান্সক্রিপ্ট বিশ্লেষণ করে একটি বিস্তারিত সারাংশ তৈরি করুন বাংলা ভাষায়:
 {transcript_text}
@@ -65,18 +149,368 @@ def generate_meeting_summary_array(transcript_text):
 
 উত্তর অবশ্যই বাংলায় এবং ইউনিকোডে লিখতে হবে। [/INST]"""
     
-    inputs = tokenizer(prompt, return_tensors="pt").to("cuda")
-    outputs = model.generate(**inputs, max_new_tokens=1000)
-    summary = tokenizer.decode(outputs[0], skip_special_tokens=True)
+    tokenizer, model = engine_registry.get("summary")
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    prompt_length = inputs.input_ids.shape[-1]
+    budget = generation_budget(
+        count_tokens([transcript_text])[0],
+        settings.SUMMARY_MIN_NEW_TOKENS,
+        settings.SUMMARY_MAX_NEW_TOKENS
+    )
+    outputs = model.generate(
+        **inputs,
+        max_new_tokens=budget,
+        stopping_criteria=build_stopping_criteria(tokenizer, prompt_length, SUMMARY_SECTIONS, stop),
+        streamer=streamer
+    )
+    summary = tokenizer.decode(outputs[0][prompt_length:], skip_special_tokens=True)
 
+    return split_summary_sections(summary)
+
+def split_summary_sections(summary):
     # Split the summary into sections and return as an array
-    summary_array = [
-        extract_section(summary, "প্রধান আলোচ্য বিষয়"),
-        extract_section(summary, "গৃহীত সিদ্ধান্তসমূহ"),
-        extract_section(summary, "সামগ্রিক অনুভূতি"),
-        extract_section(summary, "অংশগ্রহণকারীদের সম্পৃক্ততা বিশ্লেষণ")
+    return [extract_section(summary, section_title) for section_title in SUMMARY_SECTIONS]
+
+def generation_budget(input_tokens, min_new_tokens, max_new_tokens):
+    """
+    max_new_tokens for a prompt over `input_tokens` tokens of transcript: a share of
+    the input (SUMMARY_NEW_TOKENS_RATIO), kept between the task's floor and ceiling.
+    """
+    budget = int(input_tokens * settings.SUMMARY_NEW_TOKENS_RATIO)
+    return max(min_new_tokens, min(max_new_tokens, budget))
+
+def sections_complete(text, sections):
+    """
+    True once every section title appears in `text` and the model has moved past the
+    last one, i.e. starts a section heading again. A blank line doesn't end the last
+    section, which may hold several paragraphs or list items; without a new heading
+    generation runs to EOS or the budget.
+    """
+    positions = [text.find(section) for section in sections]
+    if min(positions) < 0:
+        return False
+    last = max(positions)
+    tail = text[last + len(sections[positions.index(last)]):]
+    # A title at the start of a line, optionally numbered or bold, e.g. "২. **গৃহীত সিদ্ধান্তসমূহ"
+    heading = r"(?m)^[ \t]*(?:[\d#*-]+[.)]?[ \t]*)?\**[ \t]*"
+    return any(re.search(heading + re.escape(section), tail) for section in sections)
+
+class SectionsComplete:
+    """
+    Stopping criterion for generate: stop once all required sections are complete.
+
+    Only the newly generated tokens are decoded, every `check_every` steps, so the
+    check costs far less than the decode steps it saves.
+    """
+
+    def __init__(self, tokenizer, prompt_length, sections, check_every=8):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.sections = sections
+        self.check_every = check_every
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        new_tokens = input_ids.shape[-1] - self.prompt_length
+        done = False
+        if new_tokens > 0 and new_tokens % self.check_every == 0:
+            text = self.tokenizer.decode(input_ids[0][self.prompt_length:], skip_special_tokens=True)
+            done = sections_complete(text, self.sections)
+        return torch.full((input_ids.shape[0],), done, dtype=torch.bool, device=input_ids.device)
+
+class StopRequested:
+    """
+    Stopping criterion for generate: stop as soon as `event` is set, e.g. when the
+    client of a streamed summary went away.
+    """
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+def build_stopping_criteria(tokenizer, prompt_length, sections=None, stop=None):
+    """
+    Stopping criteria for a generate call: once `sections` are complete and/or once
+    the `stop` event is set. None when neither is given.
+    """
+    from transformers import StoppingCriteriaList
+
+    criteria = []
+    if sections:
+        criteria.append(SectionsComplete(tokenizer, prompt_length, sections))
+    if stop is not None:
+        criteria.append(StopRequested(stop))
+    return StoppingCriteriaList(criteria) if criteria else None
+
+def generate_with_shared_prefix(prefix, suffixes, max_new_tokens, required_sections=None, streamers=None, stop=None):
+    """
+    Generate one completion per suffix for prompts that all start with `prefix`.
+
+    The prefix (the long transcript) is prefilled once. Each generation starts from a
+    copy of that KV cache, so only the short suffix and the new tokens cost compute.
+    Each full prompt is tokenized as one string, exactly as without the cache; the
+    cache is only reused when the prompt's first tokens are the prefix's tokens.
+    Only newly generated tokens are decoded.
+
+    Args:
+        prefix (str): Shared beginning of every prompt.
+        suffixes (List[str]): Prompt endings, one per completion.
+        max_new_tokens (List[int]): Token budget for each completion.
+        required_sections (List[Optional[List[str]]]): Per completion, section titles
+            after which generation may stop early, or None to run to EOS/budget.
+        streamers (List): Per completion, a transformers streamer that receives the
+            new tokens as they are generated.
+        stop (threading.Event): Ends every generation at its next token once set.
+
+    Returns:
+        List[str]: Decoded completions in the order of `suffixes`.
+    """
+    import torch
+
+    tokenizer, model = engine_registry.get("summary")
+
+    # The prompt already starts with a literal <s>, so don't add another BOS
+    prefix_ids = tokenizer(prefix, return_tensors="pt", add_special_tokens=False).input_ids.to(model.device)
+    with torch.no_grad():
+        prefix_cache = model(input_ids=prefix_ids, use_cache=True).past_key_values
+
+    required_sections = required_sections or [None] * len(suffixes)
+    streamers = streamers or [None] * len(suffixes)
+
+    completions = []
+    for suffix, budget, sections, streamer in zip(suffixes, max_new_tokens, required_sections, streamers):
+        # Tokenizing the suffix alone would differ at the boundary (e.g. SentencePiece's leading "▁")
+        input_ids = tokenizer(prefix + suffix, return_tensors="pt", add_special_tokens=False).input_ids.to(model.device)
+        if torch.equal(input_ids[:, :prefix_ids.shape[-1]], prefix_ids):
+            past_key_values = copy.deepcopy(prefix_cache)
+        else:
+            print("Shared prefix tokenized differently inside the prompt, prefilling it again")
+            past_key_values = None
+        stopping_criteria = build_stopping_criteria(tokenizer, input_ids.shape[-1], sections, stop)
+
+        with torch.no_grad():
+            outputs = model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=past_key_values,
+                max_new_tokens=budget,
+                stopping_criteria=stopping_criteria,
+                streamer=streamer
+            )
+
+        completions.append(tokenizer.decode(outputs[0][input_ids.shape[-1]:], skip_special_tokens=True))
+
+    return completions
+
+def generate_summary_and_action_items(transcript_text, streamers=None, stop=None):
+    """
+    Generate the meeting summary and the action items from a single prefill of the transcript.
+    `streamers` optionally receive the summary and the action items tokens as they are generated,
+    and setting `stop` ends both generations early.
+
+    Returns:
+        Tuple[List[str], List[str]]: Summary sections and action items.
+    """
+    # Budgets scale with the transcript so short meetings don't reserve hundreds of decode steps
+    input_tokens = count_tokens([transcript_text])[0]
+    summary, action_items = generate_with_shared_prefix(
+        SHARED_PREFIX_PROMPT.format(transcript_text=transcript_text),
+        [SUMMARY_SUFFIX, ACTION_ITEMS_SUFFIX],
+        [
+            generation_budget(input_tokens, settings.SUMMARY_MIN_NEW_TOKENS, settings.SUMMARY_MAX_NEW_TOKENS),
+            generation_budget(input_tokens, settings.ACTION_ITEMS_MIN_NEW_TOKENS, settings.ACTION_ITEMS_MAX_NEW_TOKENS),
+        ],
+        [SUMMARY_SECTIONS, None],
+        streamers,
+        stop
+    )
+    return split_summary_sections(summary), split_action_items(action_items)
+
+def count_tokens(texts):
+    """
+    Token count of each text, without special tokens.
+    """
+    if not texts:
+        return []
+    tokenizer = load_summary_tokenizer()
+    return [len(ids) for ids in tokenizer(list(texts), add_special_tokens=False).input_ids]
+
+def split_into_windows(texts, token_counts, token_budget):
+    """
+    Group consecutive texts into windows of at most `token_budget` tokens, never
+    splitting a text. A single text longer than the budget gets a window of its own
+    (`summarize_windows` cuts such texts with `split_long_texts` first).
+
+    Returns:
+        List[List[int]]: Indices of the texts in each window.
+    """
+    windows = []
+    current = []
+    current_tokens = 0
+
+    for i, tokens in enumerate(token_counts):
+        if current and current_tokens + tokens > token_budget:
+            windows.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+
+    if current:
+        windows.append(current)
+
+    return windows
+
+def split_long_texts(texts, token_counts, token_budget):
+    """
+    Cut every text longer than `token_budget` tokens into consecutive pieces of at
+    most that many tokens, so no window has to hold more than the budget.
+
+    Returns:
+        Tuple[List[str], List[int]]: The texts and their token counts.
+    """
+    if all(tokens <= token_budget for tokens in token_counts):
+        return texts, token_counts
+
+    tokenizer = load_summary_tokenizer()
+    pieces = []
+    piece_counts = []
+    for text, tokens in zip(texts, token_counts):
+        if tokens <= token_budget:
+            pieces.append(text)
+            piece_counts.append(tokens)
+            continue
+        ids = tokenizer(text, add_special_tokens=False).input_ids
+        for first in range(0, len(ids), token_budget):
+            piece = ids[first:first + token_budget]
+            pieces.append(tokenizer.decode(piece))
+            piece_counts.append(len(piece))
+
+    return pieces, piece_counts
+
+def truncate_texts(texts, token_budget):
+    """
+    Cut texts that together are over `token_budget` tokens to an equal share of it
+    each, so every part of the meeting keeps its beginning.
+    """
+    token_counts = count_tokens(texts)
+    if sum(token_counts) <= token_budget:
+        return texts
+
+    tokenizer = load_summary_tokenizer()
+    share = max(token_budget // len(texts), 1)
+    return [
+        text if tokens <= share
+        else tokenizer.decode(tokenizer(text, add_special_tokens=False).input_ids[:share])
+        for text, tokens in zip(texts, token_counts)
     ]
-    return summary_array
+
+def generate_batch(prompts, max_new_tokens):
+    """
+    Generate completions for several prompts in padded batches of SUMMARY_MAP_BATCH_SIZE.
+    Only newly generated tokens are decoded.
+    """
+    import torch
+
+    tokenizer, model = engine_registry.get("summary")
+    completions = []
+
+    for first in range(0, len(prompts), settings.SUMMARY_MAP_BATCH_SIZE):
+        batch = prompts[first:first + settings.SUMMARY_MAP_BATCH_SIZE]
+        inputs = tokenizer(batch, return_tensors="pt", padding=True, add_special_tokens=False).to(model.device)
+
+        with torch.no_grad():
+            outputs = model.generate(**inputs, max_new_tokens=max_new_tokens)
+
+        prompt_length = inputs.input_ids.shape[-1]
+        completions.extend(
+            tokenizer.decode(output[prompt_length:], skip_special_tokens=True).strip()
+            for output in outputs
+        )
+
+    return completions
+
+def content_key(kind, texts):
+    """
+    Cache key for a piece of work over `texts`: a hash of the texts plus every
+    setting and prompt that affects the output.
+    """
+    payload = json.dumps(
+        {
+            "kind": kind,
+            "texts": texts,
+            "model": MODEL_NAME,
+            "prompts": [WINDOW_NOTES_PROMPT, SHARED_PREFIX_PROMPT, SUMMARY_SUFFIX, ACTION_ITEMS_SUFFIX],
+            "window_tokens": settings.SUMMARY_WINDOW_TOKENS,
+            "context_tokens": settings.SUMMARY_CONTEXT_TOKENS,
+            "map_max_new_tokens": settings.SUMMARY_MAP_MAX_NEW_TOKENS,
+            "shared_prefix": settings.SUMMARY_SHARED_PREFIX,
+            "budgets": [
+                settings.SUMMARY_NEW_TOKENS_RATIO,
+                settings.SUMMARY_MIN_NEW_TOKENS, settings.SUMMARY_MAX_NEW_TOKENS,
+                settings.ACTION_ITEMS_MIN_NEW_TOKENS, settings.ACTION_ITEMS_MAX_NEW_TOKENS,
+            ],
+        },
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def summarize_windows(texts):
+    """
+    Map step: split texts into token-budgeted windows and turn each window into notes.
+
+    Windows are filled greedily from the start, so when a meeting grows only its
+    last window changes and new ones are added. Notes for every window whose
+    content was seen before come from the cache; only the rest are generated.
+    """
+    texts, token_counts = split_long_texts(texts, count_tokens(texts), settings.SUMMARY_WINDOW_TOKENS)
+    windows = split_into_windows(texts, token_counts, settings.SUMMARY_WINDOW_TOKENS)
+    window_texts = [[texts[i] for i in window] for window in windows]
+    keys = [content_key("window_notes", window) for window in window_texts]
+
+    notes = [summary_cache.get(key) if summary_cache is not None else None for key in keys]
+    missing = [i for i, note in enumerate(notes) if note is None]
+    print(f"Summarizing {len(texts)} entries in {len(windows)} windows ({len(missing)} not cached)")
+
+    if missing:
+        prompts = [
+            WINDOW_NOTES_PROMPT.format(window_text="\n".join(window_texts[i]))
+            for i in missing
+        ]
+        for i, note in zip(missing, generate_batch(prompts, settings.SUMMARY_MAP_MAX_NEW_TOKENS)):
+            notes[i] = note
+            if summary_cache is not None:
+                summary_cache.put(keys[i], note)
+
+    return notes
+
+def condense_transcript(texts):
+    """
+    Reduce a transcript that doesn't fit the context budget to notes that do, by
+    summarizing windows of it and repeating on the notes until they fit. If a round
+    no longer reduces the number of notes, they are truncated to fit.
+    """
+    while sum(count_tokens(texts)) > settings.SUMMARY_CONTEXT_TOKENS:
+        notes = summarize_windows(texts)
+        if len(notes) >= len(texts):
+            # Every window already holds a single text, so another round can't shrink it
+            return truncate_texts(notes, settings.SUMMARY_CONTEXT_TOKENS)
+        texts = notes
+    return texts
+
+def summarize_text(full_text):
+    """
+    Generate summary sections and action items for text that fits the context budget.
+    """
+    if settings.SUMMARY_SHARED_PREFIX:
+        return generate_summary_and_action_items(full_text)
+    return generate_meeting_summary_array(full_text), generate_action_items_array(full_text)
 
 def extract_section(summary, section_title):
     # Helper function to extract specific sections from the summary
@@ -84,24 +518,205 @@ def extract_section(summary, section_title):
     match = re.search(pattern, summary, re.DOTALL)
     return match.group(1).strip() if match else "[তথ্য পাওয়া যায়নি]"
 
-def process_meeting_summary(transcript):
+def summarize_transcript_events(texts, stream=False, stop=None):
     """
-    Process the meeting transcript to generate a summary and action items as arrays.
+    The summarization flow shared by `summarize_transcript` and `stream_meeting_summary`:
+    answer from the cache when the same texts were summarized before, otherwise
+    condense long meetings, generate and cache the result.
 
-    Args:
-        transcript (List[Dict]): List of transcript entries.
-
-    Returns:
-        Dict: Summary and action items as arrays.
+    A generator that returns (via StopIteration) the result. With `stream` it yields
+    the events of `stream_meeting_summary` on the way, without it yields nothing.
+    `stop` ends a streamed generation early.
     """
+    # A transcript identical to one already processed is answered from the cache
+    result_key = content_key("meeting_summary", texts)
+    if summary_cache is not None:
+        cached = summary_cache.get(result_key)
+        if cached is not None:
+            if stream:
+                for index, content in enumerate(cached["summary"]):
+                    yield "section", {"index": index, "title": SUMMARY_SECTIONS[index], "content": content}
+                for index, content in enumerate(cached["action_items"]):
+                    yield "action_item", {"index": index, "content": content}
+            return cached
+
+    # Long meetings are first condensed window by window so the final prompts fit the context
+    if settings.SUMMARY_MAP_REDUCE:
+        if stream:
+            yield "status", {"stage": "condensing"}
+        texts = condense_transcript(texts)
+
     # Combine all text for processing
-    full_text = "\n".join([f"{seg['dialogue']}" for seg in transcript])
+    full_text = "\n".join(texts)
 
     # Generate summary and action items
-    meeting_summary_array = generate_meeting_summary_array(full_text)
-    action_items_array = generate_action_items_array(full_text)
+    if stream:
+        yield "status", {"stage": "generating"}
+        meeting_summary_array, action_items_array = yield from stream_summary_and_action_items(full_text, stop)
+        if stop is not None and stop.is_set():
+            # Cut short, don't cache (or return) a partial summary
+            raise Exception("Summary generation was stopped")
+    else:
+        meeting_summary_array, action_items_array = summarize_text(full_text)
 
-    return {
+    result = {
         "summary": meeting_summary_array,
         "action_items": action_items_array
     }
+    if summary_cache is not None:
+        summary_cache.put(result_key, result)
+
+    return result
+
+def summarize_transcript(texts):
+    """
+    Summary and action items for a list of transcript texts, from the cache when
+    the same texts were summarized before.
+    """
+    # Without streaming the flow yields nothing, so its first step runs it to the end
+    try:
+        next(summarize_transcript_events(texts))
+    except StopIteration as done:
+        return done.value
+
+def stream_summary_and_action_items(transcript_text, stop=None):
+    """
+    Generate the summary and action items like `summarize_text`, yielding events
+    while the model decodes instead of waiting for the end:
+
+        ("token", {"task": "summary" | "action_items", "text": ...})
+        ("section", {"index": ..., "title": ..., "content": ...})   once a summary section is complete
+        ("action_item", {"index": ..., "content": ...})             once an action item is complete
+
+    Generation runs in a background thread, which ends at its next token once `stop`
+    is set or this generator is closed. Returns (via StopIteration) the summary
+    sections and action items.
+    """
+    import threading
+    from transformers import TextIteratorStreamer
+
+    tokenizer, _ = engine_registry.get("summary")
+    streamers = [TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True) for _ in range(2)]
+    stop = stop or threading.Event()
+    failure = []
+
+    def run():
+        try:
+            if settings.SUMMARY_SHARED_PREFIX:
+                generate_summary_and_action_items(transcript_text, streamers, stop)
+            else:
+                generate_meeting_summary_array(transcript_text, streamers[0], stop)
+                generate_action_items_array(transcript_text, streamers[1], stop)
+        except Exception as e:
+            failure.append(e)
+            # Unblock the consumer, whichever streamer it is waiting on
+            for streamer in streamers:
+                streamer.end()
+
+    worker = threading.Thread(target=run, name="summary-stream", daemon=True)
+    worker.start()
+
+    try:
+        # Summary: a section is complete once the title of a later section has appeared
+        summary = ""
+        sections_sent = 0
+        for chunk in streamers[0]:
+            if failure:
+                break
+            summary += chunk
+            yield "token", {"task": "summary", "text": chunk}
+            found = [i for i, title in enumerate(SUMMARY_SECTIONS) if title in summary]
+            while found and sections_sent < max(found):
+                title = SUMMARY_SECTIONS[sections_sent]
+                yield "section", {"index": sections_sent, "title": title, "content": extract_section(summary, title)}
+                sections_sent += 1
+
+        # Action items: an item is complete once the next one has started
+        action_items = ""
+        items_sent = 0
+        if not failure:
+            summary_array = split_summary_sections(summary)
+            for index in range(sections_sent, len(SUMMARY_SECTIONS)):
+                yield "section", {"index": index, "title": SUMMARY_SECTIONS[index], "content": summary_array[index]}
+
+            for chunk in streamers[1]:
+                if failure:
+                    break
+                action_items += chunk
+                yield "token", {"task": "action_items", "text": chunk}
+                items = split_action_items(action_items)
+                while items_sent < len(items) - 1:
+                    yield "action_item", {"index": items_sent, "content": items[items_sent]}
+                    items_sent += 1
+
+        worker.join()
+        if failure:
+            raise failure[0]
+
+        action_items_array = split_action_items(action_items)
+        for index in range(items_sent, len(action_items_array)):
+            yield "action_item", {"index": index, "content": action_items_array[index]}
+
+        return summary_array, action_items_array
+    finally:
+        if worker.is_alive():
+            # Closed before the end (e.g. the client went away): let the worker stop at its next token
+            stop.set()
+
+def stream_meeting_summary(transcript, stop=None):
+    """
+    Streaming variant of `process_meeting_summary`. Yields (event, data) pairs as
+    the summary and action items are generated, and finally ("done", result) with
+    the same result `process_meeting_summary` returns. Setting `stop` (or closing
+    the generator) ends the generation early.
+    """
+    texts = [f"{seg['dialogue']}" for seg in transcript]
+    result = dict((yield from summarize_transcript_events(texts, stream=True, stop=stop)))
+
+    if engine_registry.is_enabled("sentiment"):
+        result["transcript"] = annotate_sentiment(transcript)
+    yield "done", result
+
+def estimate_summary_cost(transcript):
+    """
+    Admission cost of summarizing a transcript: its token count, or 0 when the
+    result is already cached and no generation will run. Needs only the tokenizer,
+    so a request waiting for admission never loads the model.
+    """
+    texts = [f"{seg['dialogue']}" for seg in transcript]
+    if summary_cache is not None and summary_cache.contains(content_key("meeting_summary", texts)):
+        return 0
+    return sum(count_tokens(texts))
+
+def annotate_sentiment(transcript):
+    """
+    Fill in the sentiment of every entry that doesn't have one yet.
+    """
+    missing = [seg for seg in transcript if not seg.get("sentiment")]
+    if not missing:
+        return transcript
+
+    analyzer = engine_registry.get("sentiment")
+    labels = analyzer.classify([seg["dialogue"] for seg in missing])
+    for seg, label in zip(missing, labels):
+        seg["sentiment"] = label
+    return transcript
+
+def process_meeting_summary(transcript):
+    """
+    Process the meeting transcript to generate a summary and action items as arrays,
+    and per-entry sentiment when the sentiment engine is enabled.
+
+    Args:
+        transcript (List[Dict]): List of transcript entries.
+
+    Returns:
+        Dict: Summary and action items as arrays, and the transcript with sentiment.
+    """
+    texts = [f"{seg['dialogue']}" for seg in transcript]
+    result = dict(summarize_transcript(texts))
+
+    if engine_registry.is_enabled("sentiment"):
+        result["transcript"] = annotate_sentiment(transcript)
+
+    return result
@@ -1,20 +1,110 @@
 from google.cloud import speech
+from google.api_core import exceptions as google_exceptions
 import os
+import bisect
+import itertools
+import random
+import threading
+import time
+import concurrent.futures
 from dotenv import load_dotenv
 from google.oauth2 import service_account
-from pydub import AudioSegment, silence
-from typing import List, Dict
-import tempfile
-import json
+import numpy as np
+from typing import List, Dict, Callable, Optional, Tuple
+from app.core.config import settings
+from app.utils.silence_detection import split_on_silence
+from app.utils.audio_decoding import load_audio
+from app.utils.transcript_cache import TranscriptCache, transcript_cache, hash_file
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2  # LINEAR16
+
+# Errors worth retrying: the request may succeed if sent again a little later
+RETRYABLE_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.Aborted,
+    concurrent.futures.TimeoutError,
+)
 
 class GoogleTranscriptionService:
-    def __init__(self):
-        # Load environment variables
-        if not load_dotenv():
-            print("Warning: No .env file found or error loading .env file")
+    # Parameters for split_on_silence, in ms / dBFS
+    silence_params = {
+        "min_silence_len": 300,
+        "silence_thresh": -35,
+        "keep_silence": 150,
+        "seek_step": 10,
+    }
+
+    def __init__(
+        self,
+        speech_client=None,
+        client_pool_size: int = None,
+        max_concurrency: int = None,
+        max_retries: int = None,
+        retry_backoff: float = None,
+        max_window_seconds: float = None,
+        cache: Optional[TranscriptCache] = transcript_cache
+    ):
+        """
+        Args:
+            speech_client: Client to use instead of building a SpeechClient from
+                GOOGLE_CLOUD_CREDENTIALS, e.g. a local fake for testing
+            client_pool_size: Number of SpeechClients (each with its own gRPC channel)
+                that concurrent requests are spread over
+            max_concurrency: Maximum number of chunks recognized at the same time
+            max_retries: Retries per chunk after a transient API error
+            retry_backoff: Base delay in seconds for exponential backoff between retries
+            max_window_seconds: Longest request window that adjacent chunks are packed into
+            cache: Transcript cache consulted before any work is done; None disables caching
+        """
+        self.max_concurrency = max_concurrency or settings.GOOGLE_CHUNK_CONCURRENCY
+        self.max_retries = max_retries if max_retries is not None else settings.GOOGLE_CHUNK_MAX_RETRIES
+        self.retry_backoff = retry_backoff if retry_backoff is not None else settings.GOOGLE_CHUNK_RETRY_BACKOFF_SECONDS
+        self.max_window_seconds = max_window_seconds or settings.GOOGLE_MAX_WINDOW_SECONDS
+        self.cache = cache
+        self.sync_max_seconds = settings.GOOGLE_SYNC_RECOGNIZE_MAX_SECONDS
+
+        if speech_client is not None:
+            self.credentials = None
+            self.client_pool = [speech_client]
+        else:
+            # Load environment variables
+            if not load_dotenv():
+                print("Warning: No .env file found or error loading .env file")
+
+            self.credentials = self._load_credentials()
+            pool_size = client_pool_size or settings.GOOGLE_SPEECH_CLIENT_POOL_SIZE
+            self.client_pool = [speech.SpeechClient(credentials=self.credentials) for _ in range(pool_size)]
 
-        self.credentials = self._load_credentials()
-        self.speech_client = speech.SpeechClient(credentials=self.credentials)
+        self.speech_client = self.client_pool[0]
+        self._client_cycle = itertools.cycle(self.client_pool)
+        self._client_lock = threading.Lock()
+        self._configs: Dict[str, speech.RecognitionConfig] = {}
+
+    def _next_client(self):
+        """
+        Round-robin over the client pool so concurrent requests use every channel.
+        """
+        with self._client_lock:
+            return next(self._client_cycle)
+
+    def _recognition_config(self, language_code: str) -> speech.RecognitionConfig:
+        config = self._configs.get(language_code)
+        if config is None:
+            config = speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=SAMPLE_RATE,
+                language_code=language_code,
+                enable_automatic_punctuation=True,
+                enable_word_time_offsets=True,
+                use_enhanced=True,
+                model="default"
+            )
+            self._configs[language_code] = config
+        return config
 
     def _load_credentials(self):
         """Load credentials from JSON file."""
@@ -33,65 +123,130 @@ class GoogleTranscriptionService:
 
     def chunk_audio(self, audio_path: str) -> List[Dict]:
         """
-        Split the audio file into chunks based on silence detection.
+        Decode the audio once into a 16 kHz mono LINEAR16 buffer, split it on silence
+        and pack adjacent chunks into request windows of at most `max_window_seconds`.
+
+        Windows hold zero-copy memoryview slices of the decoded buffer; nothing is
+        written to disk. Times are positions in the original recording.
         """
-        audio = AudioSegment.from_file(audio_path)
-        audio = audio.set_frame_rate(16000).set_channels(1)
+        # 16 kHz WAVs are mapped in place, other formats are decoded in the audio process pool
+        samples = load_audio(audio_path, SAMPLE_RATE, np.int16)
+        pcm = memoryview(samples).cast("B")
 
-        # Split audio based on silence
-        chunks = silence.split_on_silence(
-            audio,
-            min_silence_len=300,
-            silence_thresh=-35,
-            keep_silence=150,
-            seek_step=10
+        # Split audio based on silence; fully silent chunks are dropped
+        starts, ends = split_on_silence(
+            samples,
+            SAMPLE_RATE,
+            **self.silence_params
         )
+        ranges = list(zip(starts.tolist(), ends.tolist()))
 
         chunk_info = []
-        total_duration = 0
-
-        for i, chunk in enumerate(chunks):
-            temp_chunk_path = tempfile.NamedTemporaryFile(delete=False, suffix=f"_chunk_{i}.wav").name
-            chunk.export(temp_chunk_path, format="wav")
 
-            duration = len(chunk) / 1000  # Duration in seconds
+        for window in self.pack_chunks(ranges):
             chunk_info.append({
-                "file": temp_chunk_path,
-                "start": total_duration,
-                "end": total_duration + duration
+                "audio": [
+                    pcm[start * BYTES_PER_SAMPLE:end * BYTES_PER_SAMPLE]
+                    for start, end in window["ranges"]
+                ],
+                "start": window["start"],
+                "end": window["end"],
+                "offsets": window["offsets"]
             })
 
-            total_duration += duration
-
         return chunk_info
 
-    def transcribe_chunk(self, chunk_path: str, chunk_start: float, language_code: str = "bn-IN") -> List[Dict]:
+    def pack_chunks(self, ranges: List[Tuple[int, int]]) -> List[Dict]:
         """
-        Transcribe a single audio chunk using Google Speech-to-Text API.
+        Merge adjacent silence chunks, given as (start, end) sample ranges, into
+        windows no longer than `max_window_seconds` so that many short fragments
+        cost one recognition request instead of one each.
+
+        Each window carries an offset map: one entry per packed chunk giving where the
+        chunk starts inside the window and where it starts in the original audio.
+        A chunk longer than the limit gets a window of its own.
         """
-        with open(chunk_path, "rb") as audio_file:
-            content = audio_file.read()
+        max_window_samples = self.max_window_seconds * SAMPLE_RATE
+        windows = []
+        current = None
 
-        audio = speech.RecognitionAudio(content=content)
+        for start, end in ranges:
+            length = end - start
+            if length <= 0:
+                continue
 
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=16000,
-            language_code=language_code,
-            enable_automatic_punctuation=True,
-            enable_word_time_offsets=True,
-            use_enhanced=True,
-            model="default"
-        )
+            if current is not None and current["length"] + length > max_window_samples:
+                windows.append(current)
+                current = None
+
+            if current is None:
+                current = {"ranges": [], "offsets": [], "length": 0}
+
+            current["offsets"].append({
+                "window_start": current["length"] / SAMPLE_RATE,
+                "timeline_start": start / SAMPLE_RATE,
+                "duration": length / SAMPLE_RATE
+            })
+            current["ranges"].append((start, end))
+            current["length"] += length
+
+        if current is not None:
+            windows.append(current)
+
+        for window in windows:
+            window["start"] = window["ranges"][0][0] / SAMPLE_RATE
+            window["end"] = window["ranges"][-1][1] / SAMPLE_RATE
+
+        return windows
+
+    @staticmethod
+    def map_window_time(seconds: float, offsets: List[Dict]) -> float:
+        """
+        Map a time inside a packed window back onto the transcript timeline.
+        """
+        starts = [entry["window_start"] for entry in offsets]
+        index = max(bisect.bisect_right(starts, seconds) - 1, 0)
+        entry = offsets[index]
+        return entry["timeline_start"] + (seconds - entry["window_start"])
+
+    def transcribe_chunk(
+        self,
+        audio_content: bytes,
+        chunk_start: float,
+        language_code: str = "bn-IN",
+        offsets: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """
+        Transcribe a single audio chunk of raw 16 kHz LINEAR16 samples using Google Speech-to-Text API.
 
-        operation = self.speech_client.long_running_recognize(config=config, audio=audio)
-        response = operation.result(timeout=300)
+        If `offsets` is given (a packed window from `pack_chunks`), word times are
+        mapped through it instead of being shifted by `chunk_start`.
+
+        Audio up to `sync_max_seconds` goes through the synchronous recognize call;
+        only longer windows pay for a long-running operation and its polling.
+        """
+        audio = speech.RecognitionAudio(content=audio_content)
+        config = self._recognition_config(language_code)
+        client = self._next_client()
+
+        duration = len(audio_content) / (SAMPLE_RATE * BYTES_PER_SAMPLE)
+        if duration <= self.sync_max_seconds:
+            response = client.recognize(config=config, audio=audio)
+        else:
+            operation = client.long_running_recognize(config=config, audio=audio)
+            response = operation.result(timeout=300)
 
         results = []
         for result in response.results:
             for word_info in result.alternatives[0].words:
-                start = word_info.start_time.total_seconds() + chunk_start
-                end = word_info.end_time.total_seconds() + chunk_start
+                start = word_info.start_time.total_seconds()
+                end = word_info.end_time.total_seconds()
+                if offsets:
+                    start = self.map_window_time(start, offsets)
+                    end = max(self.map_window_time(end, offsets), start)
+                else:
+                    start += chunk_start
+                    end += chunk_start
                 results.append({
                     "start": start,
                     "end": end,
@@ -100,6 +255,73 @@ class GoogleTranscriptionService:
 
         return results
 
+    def transcribe_chunk_with_retry(
+        self,
+        audio_content: bytes,
+        chunk_start: float,
+        language_code: str = "bn-IN",
+        offsets: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """
+        Transcribe a chunk, retrying transient API errors with exponential backoff and jitter.
+        """
+        attempt = 0
+        while True:
+            try:
+                return self.transcribe_chunk(audio_content, chunk_start, language_code, offsets)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise Exception(f"Chunk at {chunk_start:.2f}s failed after {attempt + 1} attempts: {str(e)}")
+                delay = self.retry_backoff * (2 ** attempt) * (0.5 + random.random())
+                print(f"Retrying chunk at {chunk_start:.2f}s in {delay:.2f}s after error: {str(e)}")
+                time.sleep(delay)
+                attempt += 1
+
+    def _recognize_window(self, chunk: Dict, language_code: str) -> List[Dict]:
+        """
+        Join a window's PCM slices into request content and recognize it. The join is
+        the only copy of the samples and happens in the worker, so at most
+        `max_concurrency` request bodies exist at once.
+        """
+        audio_content = b"".join(chunk["audio"])
+        return self.transcribe_chunk_with_retry(audio_content, chunk["start"], language_code, chunk.get("offsets"))
+
+    def transcribe_chunks(
+        self,
+        chunk_info: List[Dict],
+        language_code: str = "bn-BD",
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> List[Dict]:
+        """
+        Recognize chunks concurrently (at most `max_concurrency` in flight) and
+        return all words in chunk order.
+        """
+        if not chunk_info:
+            return []
+
+        chunk_words: List[Optional[List[Dict]]] = [None] * len(chunk_info)
+        workers = min(self.max_concurrency, len(chunk_info))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="google-chunk") as executor:
+            futures = {
+                executor.submit(self._recognize_window, chunk, language_code): i
+                for i, chunk in enumerate(chunk_info)
+            }
+            try:
+                for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    chunk_words[futures[future]] = future.result()
+                    if progress_callback:
+                        progress_callback(done, len(chunk_info))
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        all_words = []
+        for words in chunk_words:
+            all_words.extend(words)
+        return all_words
+
     def build_phrases(self, words: List[Dict], pause_threshold: float = 0.4) -> List[Dict]:
         """
         Combine words into phrases based on pauses.
@@ -145,18 +367,43 @@ class GoogleTranscriptionService:
         seconds = seconds % 60
         return f"{hours:02}:{minutes:02}:{seconds:06.3f}"
 
-    def process_audio(self, audio_path: str, language_code: str = "bn-BD") -> List[Dict]:
+    def process_audio(
+        self,
+        audio_path: str,
+        language_code: str = "bn-BD",
+        progress_callback: Optional[Callable[[float, str], None]] = None,
+        audio_hash: Optional[str] = None
+    ) -> List[Dict]:
         """
         Main method to process audio: chunk, transcribe, and generate formatted transcript.
+        Results are cached by audio content, so a re-uploaded recording returns at once.
+
+        Args:
+            audio_path: Path of the audio file to transcribe
+            language_code: Language code for transcription
+            progress_callback: Optional callable receiving (fraction, message) as work completes
+            audio_hash: SHA-256 of the file if the caller already computed it
         """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(audio_hash or hash_file(audio_path), language_code, self.cache_config())
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                if progress_callback:
+                    progress_callback(1.0, "Served from transcript cache")
+                return cached
+
         # Step 1: Chunk the audio
         chunk_info = self.chunk_audio(audio_path)
+        if progress_callback:
+            progress_callback(0.05, f"Split audio into {len(chunk_info)} chunks")
 
-        # Step 2: Transcribe each chunk
-        all_words = []
-        for chunk in chunk_info:
-            words = self.transcribe_chunk(chunk["file"], chunk["start"], language_code)
-            all_words.extend(words)
+        # Step 2: Transcribe the chunks concurrently, keeping word order
+        def on_chunk_done(done: int, total: int):
+            if progress_callback:
+                progress_callback(0.05 + 0.9 * done / total, f"Transcribed chunk {done}/{total}")
+
+        all_words = self.transcribe_chunks(chunk_info, language_code, progress_callback=on_chunk_done)
 
         # Step 3: Build phrases from words
         transcript = self.build_phrases(all_words)
@@ -170,8 +417,27 @@ class GoogleTranscriptionService:
                 "text": segment["text"]
             })
 
+        if cache_key is not None:
+            self.cache.put(cache_key, formatted_transcript)
+
         return formatted_transcript
 
+    def cache_config(self) -> Dict:
+        """
+        Cache key config besides the audio hash and the language code: the recognition
+        model, the silence splitting and window packing that decide the request
+        boundaries, and the decoder that produces the samples.
+        """
+        return {
+            "engine": "google",
+            "model": "default",
+            "use_enhanced": True,
+            "silence": self.silence_params,
+            "max_window_seconds": self.max_window_seconds,
+            # Resampling moved from pydub to ffmpeg, which changes the samples slightly
+            "decoder": "ffmpeg",
+        }
+
     def save_transcript(self, transcript: List[Dict], output_path: str):
         """
         Save the transcript to a text file.
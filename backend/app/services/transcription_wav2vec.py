@@ -1,37 +1,175 @@
+import threading
+import numpy as np
 import torch
-import torchaudio
+from typing import Dict, Iterable, List, Optional
 from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
 from torchaudio.transforms import Resample
+from app.core.config import settings
+from app.utils.audio_decoding import stream_audio_blocks
+from app.utils.transcript_cache import TranscriptCache, transcript_cache, hash_file
+
+SAMPLE_RATE = 16000
+
 
 class Wav2Vec2TranscriptionService:
-    def __init__(self):
-        # self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        # self.processor = Wav2Vec2Processor.from_pretrained("tanmoyio/wav2vec2-large-xlsr-bengali")
-        # self.model = Wav2Vec2ForCTC.from_pretrained("tanmoyio/wav2vec2-large-xlsr-bengali").to(self.device)
-        # self.resampler = Resample(orig_freq=48_000, new_freq=16_000)
-        print("----")
-
-    def transcribe_audio(self, audio_path: str) -> str:
-        try:
-            # Load and preprocess audio
-            speech_array, sampling_rate = torchaudio.load(audio_path)
+    """
+    Local CTC transcription with wav2vec2.
+
+    Audio is cut into fixed windows that overlap by `stride` samples on each side.
+    Windows run through the model in batches, and the logits frames that fall in
+    a window's stride context are dropped before the per-window predictions are
+    joined, so each stretch of audio is decoded with context on both sides.
+    Memory stays bounded by one batch of windows whatever the recording length.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[TranscriptCache] = transcript_cache,
+        chunk_seconds: float = None,
+        stride_seconds: float = None,
+        batch_size: int = None
+    ):
+        self.cache = cache
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.model_path = settings.WAV2VEC_MODEL
+        self.chunk_length = int((chunk_seconds or settings.WAV2VEC_CHUNK_SECONDS) * SAMPLE_RATE)
+        self.stride = int((stride_seconds or settings.WAV2VEC_STRIDE_SECONDS) * SAMPLE_RATE)
+        self.batch_size = batch_size or settings.WAV2VEC_BATCH_SIZE
+        if self.chunk_length <= 2 * self.stride:
+            raise Exception("WAV2VEC_CHUNK_SECONDS must be more than twice WAV2VEC_STRIDE_SECONDS")
+
+        self._resamplers: Dict[int, Resample] = {}
+        self._resampler_lock = threading.Lock()
+        self._load_model()
+
+    def _load_model(self):
+        print("Loading Wav2Vec2 model...")
+        self.processor = Wav2Vec2Processor.from_pretrained(self.model_path)
+        self.model = Wav2Vec2ForCTC.from_pretrained(self.model_path).eval().to(self.device)
+        # Input samples per logits frame (320 for the standard conv feature encoder)
+        self.samples_per_frame = int(np.prod(self.model.config.conv_stride))
+        print("Model loaded successfully")
+
+    def _resampler(self, orig_freq: int) -> Resample:
+        """
+        Resampler from `orig_freq` to 16 kHz, built once per source rate.
+        """
+        with self._resampler_lock:
+            resampler = self._resamplers.get(orig_freq)
+            if resampler is None:
+                resampler = Resample(orig_freq=orig_freq, new_freq=SAMPLE_RATE)
+                self._resamplers[orig_freq] = resampler
+            return resampler
+
+    def _windows(self, blocks: Iterable[np.ndarray]):
+        """
+        Cut a stream of 16 kHz sample blocks into (window, drop_left, is_last) tuples.
+
+        Windows are `chunk_length` long and start every `chunk_length - 2 * stride`
+        samples. `drop_left` tells whether the window's left stride is context
+        already covered by the previous window; the right stride is context unless
+        the window is the last one.
+        """
+        step = self.chunk_length - 2 * self.stride
+        buffer = np.empty(0, dtype=np.float32)
+        first = True
 
-            # Resample if necessary
-            if sampling_rate != 16000:
-                speech_array = self.resampler(speech_array)
+        for block in blocks:
+            buffer = np.concatenate((buffer, block))
+            # Only emit a window once audio follows it, otherwise it may be the last one
+            while len(buffer) > self.chunk_length:
+                yield buffer[:self.chunk_length], not first, False
+                buffer = buffer[step:]
+                first = False
 
-            # Prepare inputs for Wav2Vec2
-            inputs = self.processor(speech_array.squeeze().numpy(), sampling_rate=16_000, return_tensors="pt", padding=True)
+        if len(buffer) or first:
+            yield buffer, not first, True
 
-            # Perform inference
-            with torch.no_grad():
-                logits = self.model(inputs.input_values.to(self.device)).logits
+    def _predict(self, windows: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Argmax CTC ids for equally long windows, in one forward pass.
+        """
+        inputs = self.processor(windows, sampling_rate=SAMPLE_RATE, return_tensors="pt", padding=True)
+        with torch.no_grad():
+            logits = self.model(inputs.input_values.to(self.device)).logits
+        return list(torch.argmax(logits, dim=-1).cpu().numpy())
 
-            # Decode transcription
-            predicted_ids = torch.argmax(logits, dim=-1)
-            transcription = self.processor.decode(predicted_ids[0])
-            return transcription
+    def _transcribe_blocks(self, blocks: Iterable[np.ndarray]) -> str:
+        stride_frames = self.stride // self.samples_per_frame
+        # Frame index where a full window's right stride begins (taken from sample
+        # positions, as the feature encoder yields slightly fewer frames than samples / ratio)
+        right_frame = (self.chunk_length - self.stride) // self.samples_per_frame
+        # Shorter inputs don't fill the conv feature encoder's receptive field
+        min_samples = SAMPLE_RATE // 10
+        kept_ids = []
+        pending = []
 
+        def flush():
+            predictions = self._predict([window for window, _, _ in pending])
+            for ids, (_, drop_left, is_last) in zip(predictions, pending):
+                start = stride_frames if drop_left else 0
+                end = len(ids) if is_last else right_frame
+                kept_ids.append(ids[start:end])
+            pending.clear()
+
+        for window, drop_left, is_last in self._windows(blocks):
+            if len(window) < min_samples:
+                window = np.pad(window, (0, min_samples - len(window)))
+            # Only windows of one length share a batch, so no padding ever reaches the model
+            if pending and (len(pending) == self.batch_size or len(pending[0][0]) != len(window)):
+                flush()
+            pending.append((window, drop_left, is_last))
+        if pending:
+            flush()
+
+        # CTC decoding over the joined frames also merges repeats across window edges
+        predicted_ids = np.concatenate(kept_ids) if kept_ids else np.empty(0, dtype=np.int64)
+        return self.processor.decode(predicted_ids)
+
+    def transcribe_array(self, waveform, sampling_rate: int) -> str:
+        """
+        Transcribe audio already in memory, shape (samples,) or (channels, samples).
+        """
+        waveform = torch.as_tensor(waveform, dtype=torch.float32)
+        if waveform.dim() > 1:
+            waveform = waveform.mean(dim=0)
+        if sampling_rate != SAMPLE_RATE:
+            waveform = self._resampler(sampling_rate)(waveform)
+        samples = waveform.numpy()
+
+        block = self.chunk_length
+        return self._transcribe_blocks(samples[i:i + block] for i in range(0, len(samples), block))
+
+    def cache_config(self):
+        """
+        Cache key config besides the audio hash: the CTC model and the window and stride
+        lengths, which decide where the audio is cut and how much context each cut sees.
+        """
+        return {
+            "engine": "wav2vec",
+            "model": self.model_path,
+            "chunk_length": self.chunk_length,
+            "stride": self.stride,
+        }
+
+    def transcribe_audio(self, audio_path: str, audio_hash: Optional[str] = None) -> str:
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(audio_hash or hash_file(audio_path), None, self.cache_config())
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print(f"Transcript for {audio_path} served from cache")
+                return cached
+
+        try:
+            # ffmpeg decodes and resamples to 16 kHz mono block by block
+            transcription = self._transcribe_blocks(
+                stream_audio_blocks(audio_path, SAMPLE_RATE, self.chunk_length)
+            )
         except Exception as e:
             print(f"Error during Wav2Vec2 transcription: {str(e)}")
             raise Exception(f"Transcription failed: {str(e)}")
+
+        if cache_key is not None:
+            self.cache.put(cache_key, transcription)
+        return transcription
@@ -1,43 +1,149 @@
-import librosa
+import os
+import sys
+import time
 import torch
 import numpy as np
+from typing import Optional
 from transformers import (
     WhisperProcessor,
     WhisperFeatureExtractor,
     WhisperForConditionalGeneration,
 )
+from app.core.config import settings
+from app.utils.transcript_cache import TranscriptCache, transcript_cache, hash_file
+from app.utils.silence_detection import detect_silence
+from app.utils.audio_decoding import load_audio
+
+WHISPER_BACKENDS = ("torch", "int8", "onnx")
+
+
+def character_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    Character-level edit distance between two transcripts, relative to the reference length.
+    """
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_char in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_char in enumerate(hypothesis, 1):
+            current.append(min(
+                previous[j] + 1,                          # deletion
+                current[j - 1] + 1,                       # insertion
+                previous[j - 1] + (ref_char != hyp_char)  # substitution
+            ))
+        previous = current
+    return previous[-1] / len(reference)
 
 
 class WhisperTranscriptionService:
-    def __init__(self):
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    def __init__(
+        self,
+        cache: Optional[TranscriptCache] = transcript_cache,
+        batch_size: int = None,
+        backend: str = None
+    ):
+        self.cache = cache
+        self.batch_size = batch_size or settings.WHISPER_BATCH_SIZE
+        self.backend = backend or settings.WHISPER_BACKEND
+        if self.backend not in WHISPER_BACKENDS:
+            raise Exception(f"Unknown Whisper backend '{self.backend}', expected one of {', '.join(WHISPER_BACKENDS)}")
+        # The int8 and ONNX Runtime backends are CPU engines
+        use_cuda = self.backend == "torch" and torch.cuda.is_available()
+        self.device = torch.device('cuda' if use_cuda else 'cpu')
         self.model_path = "shhossain/whisper-base-bn"
-        self.max_length = 25 * 16000  # 25 seconds of audio at 16kHz
-        self.overlap = 5 * 16000      # 5 seconds overlap between segments
-        # self._load_model()
+        self.max_length = int(settings.WHISPER_MAX_SEGMENT_SECONDS * 16000)  # Stay under Whisper's 30 s window
+        self.min_length = int(settings.WHISPER_MIN_SEGMENT_SECONDS * 16000)  # Don't cut tiny segments
+        self.min_silence_len = 300         # ms of silence that counts as a pause
+        self.silence_margin = 16           # dB below the average level that counts as silence
+        self.fallback_search = 5 * 16000   # Without a pause, cut at the quietest point of the last 5 s
+        # Constructed lazily by the engine registry, so loading here only happens on first use
+        self._load_model()
 
     def _load_model(self):
-        print("Loading ASR model...")
+        print(f"Loading ASR model ({self.backend} backend)...")
         self.feature_extractor = WhisperFeatureExtractor.from_pretrained(self.model_path)
         self.processor = WhisperProcessor.from_pretrained(self.model_path)
-        self.model = WhisperForConditionalGeneration.from_pretrained(self.model_path).to(self.device)
+        self._configure_threads()
+
+        if self.backend == "onnx":
+            self.model = self._load_onnx_model()
+        else:
+            model = WhisperForConditionalGeneration.from_pretrained(self.model_path).eval()
+            if self.backend == "int8":
+                # Dynamic int8 weights for every Linear layer; activations stay float
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.model = model.to(self.device)
         print("Model loaded successfully")
 
+    def _configure_threads(self):
+        """
+        Apply WHISPER_INTRA_OP_THREADS / WHISPER_INTER_OP_THREADS (0 keeps the library default).
+        """
+        if self.device.type != "cpu":
+            return
+        if settings.WHISPER_INTRA_OP_THREADS > 0:
+            torch.set_num_threads(settings.WHISPER_INTRA_OP_THREADS)
+        if settings.WHISPER_INTER_OP_THREADS > 0:
+            try:
+                torch.set_num_interop_threads(settings.WHISPER_INTER_OP_THREADS)
+            except RuntimeError:
+                # Can only be set before the first parallel op in the process
+                print("Inter-op thread count already fixed for this process, keeping it")
+
+    def _load_onnx_model(self):
+        """
+        ONNX Runtime encoder/decoder (with past key values) through optimum. The export
+        is saved to WHISPER_ONNX_DIR when set, and loaded from there on later starts.
+        """
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+        except ImportError:
+            raise Exception("The onnx Whisper backend needs `pip install -r requirements-onnx.txt` (optimum[onnxruntime])")
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if settings.WHISPER_INTRA_OP_THREADS > 0:
+            session_options.intra_op_num_threads = settings.WHISPER_INTRA_OP_THREADS
+        if settings.WHISPER_INTER_OP_THREADS > 0:
+            session_options.inter_op_num_threads = settings.WHISPER_INTER_OP_THREADS
+
+        onnx_dir = settings.WHISPER_ONNX_DIR
+        exported = bool(onnx_dir) and os.path.isdir(onnx_dir) and any(
+            name.endswith(".onnx") for name in os.listdir(onnx_dir)
+        )
+        model = ORTModelForSpeechSeq2Seq.from_pretrained(
+            onnx_dir if exported else self.model_path,
+            export=not exported,
+            use_cache=True,
+            provider="CPUExecutionProvider",
+            session_options=session_options
+        )
+        if onnx_dir and not exported:
+            model.save_pretrained(onnx_dir)
+        return model
+
     def _segment_audio(self, audio_array):
         """
-        Split audio into overlapping segments with proper handling of boundaries
+        Split audio into non-overlapping segments of at most `max_length` samples,
+        cutting in the middle of detected pauses so no word is split across segments
         """
+        cut_points = self._find_pause_midpoints(audio_array)
+
         segments = []
         segment_info = []  # Store start and end times for each segment
-        
+
         start = 0
         while start < len(audio_array):
-            end = min(start + self.max_length, len(audio_array))
-            
-            # Extract segment with overlap
-            segment = audio_array[start:end]
-            segments.append(segment)
-            
+            if len(audio_array) - start <= self.max_length:
+                end = len(audio_array)
+            else:
+                end = self._choose_cut(audio_array, cut_points, start)
+
+            segments.append(audio_array[start:end])
+
             # Store timing information
             segment_info.append({
                 'start': start / 16000,  # Convert to seconds
@@ -45,15 +151,49 @@ class WhisperTranscriptionService:
                 'original_start': start,
                 'original_end': end
             })
-            
-            if end == len(audio_array):
-                break
-            
-            # Move to next segment with overlap
-            start = end - self.overlap
+
+            start = end
 
         return segments, segment_info
 
+    def _find_pause_midpoints(self, audio_array):
+        """
+        Sample index of the middle of every pause, with the silence threshold set
+        relative to the recording's average level
+        """
+        rms = np.sqrt(np.mean(np.square(audio_array, dtype=np.float64))) if len(audio_array) else 0.0
+        if rms == 0:
+            return np.empty(0, dtype=np.int64)
+
+        silence_thresh = 20 * np.log10(rms) - self.silence_margin
+        starts, ends = detect_silence(
+            audio_array,
+            16000,
+            min_silence_len=self.min_silence_len,
+            silence_thresh=silence_thresh,
+            seek_step=10
+        )
+        return (starts + ends) // 2
+
+    def _choose_cut(self, audio_array, cut_points, start):
+        """
+        Latest pause that keeps the segment within `max_length`, or the quietest
+        10 ms frame near the limit when the speaker never pauses
+        """
+        limit = start + self.max_length
+        candidates = cut_points[(cut_points > start + self.min_length) & (cut_points <= limit)]
+        if len(candidates):
+            return int(candidates[-1])
+
+        frame = 160
+        search_start = max(limit - self.fallback_search, start + self.min_length)
+        window = audio_array[search_start:limit]
+        n_frames = len(window) // frame
+        if n_frames == 0:
+            return limit
+        energies = np.square(window[:n_frames * frame], dtype=np.float64).reshape(n_frames, frame).sum(axis=1)
+        return search_start + int(np.argmin(energies)) * frame + frame // 2
+
     def _process_segment(self, segment, timing_info=None):
         """
         Process a single audio segment with timing information
@@ -71,7 +211,7 @@ class WhisperTranscriptionService:
         # Generate transcription
         with torch.no_grad():
             predicted_ids = self.model.generate(
-                inputs=input_features.to(self.device)
+                input_features=input_features.to(self.device)
             )[0]
 
         # Decode transcription
@@ -82,58 +222,84 @@ class WhisperTranscriptionService:
             'timing': timing_info
         }
 
-    def _merge_transcripts(self, transcript_segments):
+    def _process_batch(self, segments, timing_infos):
         """
-        Merge overlapping transcript segments intelligently
+        Process several audio segments with one feature extraction and one generate
+        call on the stacked batch. Returns one result per segment, in order, in the
+        same shape as `_process_segment`.
         """
-        if not transcript_segments:
-            return ""
-            
-        # If only one segment, return it directly
-        if len(transcript_segments) == 1:
-            return transcript_segments[0]['text']
-        
-        final_transcript = []
-        for i in range(len(transcript_segments)):
-            current_segment = transcript_segments[i]
-            
-            # Add first segment as is
-            if i == 0:
-                final_transcript.append(current_segment['text'])
-                continue
-                
-            # For subsequent segments, handle overlap
-            current_text = current_segment['text']
-            previous_text = transcript_segments[i-1]['text']
-            
-            # Find potential overlap in text
-            words_current = current_text.split()
-            words_previous = previous_text.split()
-            
-            # Look for overlap in last few words
-            overlap_found = False
-            for j in range(min(len(words_previous), 5)):
-                overlap_size = j + 1
-                if ' '.join(words_previous[-overlap_size:]) in current_text:
-                    # Found overlap, add only the non-overlapping part
-                    overlap_found = True
-                    overlap_index = current_text.index(' '.join(words_previous[-overlap_size:]))
-                    final_transcript.append(current_text[overlap_index + len(' '.join(words_previous[-overlap_size:])):].strip())
-                    break
-            
-            # If no overlap found, add a space and the full current segment
-            if not overlap_found:
-                final_transcript.append(current_text)
-        
-        return ' '.join(final_transcript)
+        batch = [segment.astype(np.float32) for segment in segments]
+
+        # The extractor pads every segment to Whisper's 30 s window, so they stack cleanly
+        input_features = self.feature_extractor(
+            batch,
+            sampling_rate=16000,
+            return_tensors="pt"
+        ).input_features
+
+        with torch.no_grad():
+            predicted_ids = self.model.generate(
+                input_features=input_features.to(self.device)
+            )
+
+        transcripts = self.processor.batch_decode(predicted_ids, skip_special_tokens=True)
+
+        return [
+            {
+                'text': transcript.strip(),
+                'timing': timing_info
+            }
+            for transcript, timing_info in zip(transcripts, timing_infos)
+        ]
+
+    def cache_config(self):
+        """
+        Cache key config besides the audio hash: the model, the backend (float, int8 or
+        ONNX decode slightly differently) and the pause-based segmentation lengths.
+        """
+        return {
+            "engine": "whisper",
+            "model": self.model_path,
+            "backend": self.backend,
+            "max_length": self.max_length,
+            "min_length": self.min_length,
+            "min_silence_len": self.min_silence_len,
+            "silence_margin": self.silence_margin,
+        }
+
+    def transcribe_audio(self, audio_path: str, audio_hash: Optional[str] = None) -> str:
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(audio_hash or hash_file(audio_path), None, self.cache_config())
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print(f"Transcript for {audio_path} served from cache")
+                return cached
+
+        transcript = self._transcribe_uncached(audio_path)
+        if cache_key is not None:
+            self.cache.put(cache_key, transcript)
+        return transcript
 
-    def transcribe_audio(self, audio_path: str) -> str:
+    def _transcribe_uncached(self, audio_path: str) -> str:
+        print(f"Processing audio file: {audio_path}")
         try:
-            print(f"Processing audio file: {audio_path}")
-            
-            # Load audio file
-            speech_array, sampling_rate = librosa.load(audio_path, sr=16000)
-            print(f"Audio loaded. Duration: {len(speech_array)/16000:.2f} seconds")
+            # Decode straight to 16 kHz mono float32 (16 kHz WAVs are memory-mapped)
+            speech_array = load_audio(audio_path, 16000)
+        except Exception as e:
+            print(f"Error in transcription: {str(e)}")
+            raise Exception(f"Transcription failed: {str(e)}")
+        return self.transcribe_array(speech_array)
+
+    def transcribe_array(self, speech_array: np.ndarray) -> str:
+        """
+        Transcribe 16 kHz mono samples already in memory (e.g. preprocessed audio).
+        Not cached, the caller owns the samples' identity.
+        """
+        try:
+            duration = len(speech_array) / 16000
+            print(f"Audio loaded. Duration: {duration:.2f} seconds")
+            started = time.perf_counter()
 
             # Handle short audio files directly
             if len(speech_array) <= self.max_length:
@@ -141,19 +307,27 @@ class WhisperTranscriptionService:
 
             # Split longer audio into segments
             segments, segment_info = self._segment_audio(speech_array)
-            print(f"Split audio into {len(segments)} segments with {self.overlap/16000}s overlap")
+            print(f"Split audio into {len(segments)} segments at pauses")
 
-            # Process each segment
+            # Process segments in batches
             transcripts = []
-            for i, (segment, timing) in enumerate(zip(segments, segment_info), 1):
-                print(f"Processing segment {i}/{len(segments)} ({timing['start']:.2f}s - {timing['end']:.2f}s)")
-                transcript = self._process_segment(segment, timing)
-                if transcript['text']:  # Only add non-empty transcripts
-                    transcripts.append(transcript)
-
-            # Merge transcripts with overlap handling
-            final_transcript = self._merge_transcripts(transcripts)
-            print(f"Transcription completed. Length: {len(final_transcript)} characters")
+            for first in range(0, len(segments), self.batch_size):
+                last = min(first + self.batch_size, len(segments))
+                print(
+                    f"Processing segments {first + 1}-{last}/{len(segments)} "
+                    f"({segment_info[first]['start']:.2f}s - {segment_info[last - 1]['end']:.2f}s)"
+                )
+                batch_transcripts = self._process_batch(segments[first:last], segment_info[first:last])
+                # Only add non-empty transcripts
+                transcripts.extend(transcript for transcript in batch_transcripts if transcript['text'])
+
+            # Segments don't overlap, so their texts simply follow each other
+            final_transcript = ' '.join(transcript['text'] for transcript in transcripts)
+            elapsed = time.perf_counter() - started
+            print(
+                f"Transcription completed. Length: {len(final_transcript)} characters, "
+                f"real-time factor {elapsed / max(duration, 1e-6):.3f} ({self.backend})"
+            )
             
             return final_transcript
 
@@ -169,4 +343,41 @@ class WhisperTranscriptionService:
                 if torch.cuda.is_available():
                     torch.cuda.empty_cache()
             except Exception as e:
-                print(f"Error cleaning up model: {str(e)}")
\ No newline at end of file
+                print(f"Error cleaning up model: {str(e)}")
+
+
+def compare_backends(audio_paths, backend: str = None, reference_backend: str = "torch"):
+    """
+    Accuracy and speed of a Whisper backend against the float model on sample clips.
+
+    Both services run uncached on CPU. Returns per-clip character error rate of the
+    backend's transcript against the reference transcript, and both real-time factors.
+    """
+    backend = backend or settings.WHISPER_BACKEND
+    services = {}
+    for name in (reference_backend, backend):
+        if name not in services:
+            service = WhisperTranscriptionService(cache=None, backend=name)
+            if service.device.type != "cpu":
+                service.device = torch.device("cpu")
+                service.model = service.model.to(service.device)
+            services[name] = service
+
+    results = []
+    for audio_path in audio_paths:
+        duration = len(load_audio(audio_path, 16000)) / 16000
+        row = {"audio": audio_path, "duration": round(duration, 2)}
+        transcripts = {}
+        for name in (reference_backend, backend):
+            started = time.perf_counter()
+            transcripts[name] = services[name].transcribe_audio(audio_path)
+            row[f"rtf_{name}"] = round((time.perf_counter() - started) / max(duration, 1e-6), 4)
+        row["cer"] = round(character_error_rate(transcripts[reference_backend], transcripts[backend]), 4)
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    # python -m app.services.transcription_whisper <backend> clip.mp3 [clip2.mp3 ...]
+    for row in compare_backends(sys.argv[2:], backend=sys.argv[1]):
+        print(row)
@@ -0,0 +1,237 @@
+import os
+import re
+import struct
+import subprocess
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+from pydub import AudioSegment
+
+from app.utils.process_pool import audio_process_pool
+
+# ffmpeg raw output format for each sample dtype we decode to
+_FFMPEG_FORMATS = {
+    np.dtype(np.float32): ("f32le", "pcm_f32le"),
+    np.dtype(np.int16): ("s16le", "pcm_s16le"),
+}
+
+# WAV format tags: integer PCM, IEEE float, and WAVE_FORMAT_EXTENSIBLE (real tag in the sub-format)
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def _ffmpeg_command(file_path: str, sample_rate: int, dtype=np.float32):
+    """
+    ffmpeg invocation that decodes any supported format to mono PCM (float32 or
+    int16) on stdout. Uses the same ffmpeg binary pydub was configured with.
+    """
+    sample_format, codec = _FFMPEG_FORMATS[np.dtype(dtype)]
+    return [
+        AudioSegment.converter,
+        "-nostdin",
+        "-v", "error",
+        "-i", file_path,
+        # Downmix by averaging the channels; float output would otherwise sum them at -3 dB each
+        "-rematrix_maxval", "1.0",
+        "-f", sample_format,
+        "-acodec", codec,
+        "-ac", "1",
+        "-ar", str(sample_rate),
+        "pipe:1",
+    ]
+
+
+def stream_audio_blocks(file_path: str, sample_rate: int = 16000, block_size: int = 160000) -> Iterator[np.ndarray]:
+    """
+    Decode an audio file block by block as mono float32 samples at `sample_rate`.
+
+    Only one block of `block_size` samples is held at a time, whatever the length
+    of the recording. The last block may be shorter.
+    """
+    process = subprocess.Popen(
+        _ffmpeg_command(file_path, sample_rate),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    bytes_per_block = block_size * 4
+    completed = False
+
+    try:
+        while True:
+            data = process.stdout.read(bytes_per_block)
+            if not data:
+                break
+            # A partial trailing sample can only happen if ffmpeg was cut off mid-write
+            usable = len(data) - len(data) % 4
+            if usable:
+                yield np.frombuffer(data[:usable], dtype=np.float32)
+        completed = True
+    finally:
+        process.stdout.close()
+        if not completed and process.poll() is None:
+            process.kill()
+        stderr = process.stderr.read().decode("utf-8", errors="replace")
+        process.stderr.close()
+        process.wait()
+
+    if process.returncode != 0:
+        raise Exception(f"Failed to decode {file_path}: {stderr.strip()}")
+
+
+def _wav_layout(file_path: str) -> Optional[Dict]:
+    """
+    Sample layout of an uncompressed WAV file (dtype, channels, rate, data offset and
+    frame count), or None when the file is not a WAV we can map directly.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            header = f.read(12)
+            if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+                return None
+
+            fmt = None
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    return None
+                chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+
+                if chunk_id == b"fmt ":
+                    body = f.read(chunk_size)
+                    tag, channels, rate = struct.unpack("<HHI", body[:8])
+                    bits = struct.unpack("<H", body[14:16])[0]
+                    if tag == _WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                        tag = struct.unpack("<H", body[24:26])[0]
+                    fmt = (tag, channels, rate, bits)
+                elif chunk_id == b"data":
+                    if fmt is None:
+                        return None
+                    offset = f.tell()
+                    # Streamed WAVs may carry a placeholder size, trust the file length instead
+                    available = os.path.getsize(file_path) - offset
+                    size = min(chunk_size, available)
+                    break
+                else:
+                    # Chunks are padded to an even size
+                    f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+    tag, channels, rate, bits = fmt
+    if tag == _WAVE_FORMAT_PCM and bits == 16:
+        dtype = np.dtype("<i2")
+    elif tag == _WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        dtype = np.dtype("<f4")
+    else:
+        return None
+    if channels < 1:
+        return None
+
+    return {
+        "dtype": dtype,
+        "channels": channels,
+        "sample_rate": rate,
+        "offset": offset,
+        "frames": size // (dtype.itemsize * channels),
+    }
+
+
+def _map_wav(file_path: str, sample_rate: int, dtype) -> Optional[np.ndarray]:
+    """
+    Samples of a WAV file that is already at `sample_rate`, memory-mapped from disk.
+
+    Mono files stored in `dtype` come back as the mapping itself, with no copy. Other
+    channel counts or sample types are converted in one pass. Returns None for
+    anything else, which then goes through ffmpeg.
+    """
+    layout = _wav_layout(file_path)
+    if layout is None or layout["sample_rate"] != sample_rate:
+        return None
+    if layout["frames"] == 0:
+        return np.empty(0, dtype=dtype)
+
+    samples = np.memmap(
+        file_path,
+        dtype=layout["dtype"],
+        mode="r",
+        offset=layout["offset"],
+        shape=(layout["frames"], layout["channels"])
+    )
+    dtype = np.dtype(dtype)
+
+    if layout["channels"] == 1 and layout["dtype"] == dtype:
+        return samples[:, 0]
+
+    if layout["channels"] > 1:
+        samples = samples.mean(axis=1, dtype=np.float32)
+    else:
+        samples = samples[:, 0]
+
+    if dtype == np.float32:
+        if layout["dtype"].kind == "i":
+            return np.multiply(samples, 1 / 32768, dtype=np.float32)
+        return samples.astype(np.float32)
+    # int16 output from float (or mixed-down integer) samples
+    if layout["dtype"].kind == "f":
+        samples = np.clip(samples, -1.0, 32767 / 32768) * 32768
+    return np.rint(samples).astype(np.int16)
+
+
+def decode_audio(file_path: str, sample_rate: int = 16000, dtype=np.float32) -> np.ndarray:
+    """
+    Decode a whole audio file (MP3, M4A, OGG, WAV, ...) to mono samples at
+    `sample_rate`, as float32 in [-1, 1) or int16.
+
+    WAV files already at the target rate are memory-mapped instead of decoded.
+    Everything else is decoded by ffmpeg straight into the returned buffer; no
+    intermediate file is written.
+    """
+    samples = _map_wav(file_path, sample_rate, dtype)
+    if samples is not None:
+        return samples
+
+    process = subprocess.run(
+        _ffmpeg_command(file_path, sample_rate, dtype),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    if process.returncode != 0:
+        raise Exception(f"Failed to decode {file_path}: {process.stderr.decode('utf-8', errors='replace').strip()}")
+
+    itemsize = np.dtype(dtype).itemsize
+    data = process.stdout
+    return np.frombuffer(data, dtype=dtype, count=len(data) // itemsize)
+
+
+def load_audio(file_path: str, sample_rate: int = 16000, dtype=np.float32) -> np.ndarray:
+    """
+    `decode_audio` for the API process: WAV files at the target rate are mapped
+    in place, anything that needs ffmpeg is decoded in the audio process pool.
+    """
+    samples = _map_wav(file_path, sample_rate, dtype)
+    if samples is not None:
+        return samples
+    return audio_process_pool.run(decode_audio, file_path, sample_rate, dtype)
+
+
+def probe_duration(file_path: str) -> Optional[float]:
+    """
+    Duration of an audio file in seconds without decoding it, or None when unknown.
+    WAV headers are read directly; other formats ask ffmpeg for the container duration.
+    """
+    layout = _wav_layout(file_path)
+    if layout is not None:
+        return layout["frames"] / layout["sample_rate"]
+
+    # With no output file ffmpeg only prints the stream info (and exits with an error)
+    process = subprocess.run(
+        [AudioSegment.converter, "-nostdin", "-hide_banner", "-i", file_path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE
+    )
+    match = re.search(rb"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", process.stderr)
+    if match is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
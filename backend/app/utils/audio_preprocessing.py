@@ -1,54 +1,86 @@
-import torchaudio
-import torch
 import numpy as np
-import tempfile
-from torchaudio.transforms import Resample
-from pydub import AudioSegment
+from collections import deque
+from typing import Iterator, Optional
 from scipy import signal
+from scipy import fft as scipy_fft
+from app.core.config import settings
+from app.utils.audio_decoding import decode_audio, stream_audio_blocks
+from app.utils.process_pool import audio_process_pool
+
+
+def bandpass_gain(freqs: np.ndarray, sample_rate: int, low_cutoff: float = 300, high_cutoff: float = 3400) -> np.ndarray:
+    """
+    Squared magnitude response of the 4th-order Butterworth band-pass at `freqs`.
+    This is exactly the (zero-phase) response `filtfilt` applies with that filter.
+    """
+    sos = signal.butter(4, [low_cutoff, high_cutoff], btype='band', fs=sample_rate, output='sos')
+    _, response = signal.sosfreqz(sos, worN=freqs, fs=sample_rate)
+    return (np.abs(response) ** 2).astype(np.float32)
+
 
 class AudioPreprocessor:
     def __init__(self):
         self.target_sample_rate = 16000
         self.segment_duration = 30
+        self.block_duration = settings.PREPROCESS_BLOCK_SECONDS
+        self.noise_history_duration = settings.PREPROCESS_NOISE_HISTORY_SECONDS
+        self.engine = settings.PREPROCESS_ENGINE
+        self.noise_sample_frames = settings.PREPROCESS_NOISE_SAMPLE_FRAMES
 
     def preprocess(self, file_path):
-        # Convert MP3 to WAV if needed
-        if file_path.endswith('.mp3'):
-            file_path = self.convert_mp3_to_wav(file_path)
-
-        # Load and ensure the waveform is contiguous
-        waveform, sample_rate = torchaudio.load(file_path)
-        waveform = waveform.contiguous()
+        """
+        Decode, band-pass and denoise a file. The work runs in the audio process pool;
+        the enhanced waveform comes back through shared memory.
+        """
+        return audio_process_pool.run(preprocess_file, file_path)
 
-        # Resample if needed
-        if sample_rate != self.target_sample_rate:
-            resampler = Resample(orig_freq=sample_rate, new_freq=self.target_sample_rate)
-            waveform = resampler(waveform).contiguous()
+    def preprocess_local(self, file_path):
+        # Decode straight to a 16 kHz mono float32 buffer, no intermediate WAV
+        return self.preprocess_array(decode_audio(file_path, self.target_sample_rate))
 
-        # Convert stereo to mono if needed
-        if waveform.shape[0] > 1:
-            waveform = waveform.mean(dim=0, keepdim=True).contiguous()
+    def preprocess_array(self, waveform_np):
+        """
+        Band-pass and denoise 16 kHz mono samples already in memory.
+        """
+        waveform_np = np.ascontiguousarray(waveform_np, dtype=np.float32)
 
-        # Process the entire waveform without segmentation first
-        waveform_np = waveform.squeeze().numpy()
-        waveform_np = np.ascontiguousarray(waveform_np)
+        if self.engine == "fused":
+            # Band-pass and spectral subtraction in a single float32 STFT pass
+            enhanced_waveform = self.enhance_fused(waveform_np)
+        else:
+            # Apply noise reduction
+            filtered_waveform = self.apply_noise_reduction_full(waveform_np)
 
-        # Apply noise reduction
-        filtered_waveform = self.apply_noise_reduction_full(waveform_np)
-        
-        # Apply spectral subtraction
-        enhanced_waveform = self.spectral_subtraction_full(filtered_waveform)
+            # Apply spectral subtraction
+            enhanced_waveform = self.spectral_subtraction_full(filtered_waveform)
 
         # Ensure the final array is contiguous
         final_array = np.ascontiguousarray(enhanced_waveform)
         
         return final_array, self.target_sample_rate
 
-    def convert_mp3_to_wav(self, mp3_path):
-        audio = AudioSegment.from_mp3(mp3_path)
-        temp_wav_path = tempfile.mktemp(suffix=".wav")
-        audio.export(temp_wav_path, format="wav")
-        return temp_wav_path
+    def preprocess_stream(self, file_path) -> Iterator[np.ndarray]:
+        """
+        Bounded-memory variant of `preprocess`: decode the file in blocks and yield
+        band-passed, noise-subtracted blocks at 16 kHz mono as they become ready.
+
+        Peak memory depends on the block size and noise history, not the recording length.
+        """
+        block_size = int(self.block_duration * self.target_sample_rate)
+        enhancer = StreamingEnhancer(
+            self.target_sample_rate,
+            noise_history_frames=int(self.noise_history_duration * self.target_sample_rate / 512),
+            noise_sample_frames=self.noise_sample_frames
+        )
+
+        for block in stream_audio_blocks(file_path, self.target_sample_rate, block_size):
+            processed = enhancer.process(block)
+            if len(processed):
+                yield processed
+
+        tail = enhancer.flush()
+        if len(tail):
+            yield tail
 
     def apply_noise_reduction_full(self, waveform):
         """
@@ -86,4 +118,135 @@ class AudioPreprocessor:
         # Convert back to time domain
         _, x_reconstructed = signal.istft(Zxx_denoised, self.target_sample_rate)
         
-        return np.ascontiguousarray(x_reconstructed)
\ No newline at end of file
+        return np.ascontiguousarray(x_reconstructed)
+
+    def enhance_fused(self, waveform):
+        """
+        Apply the band-pass and spectral subtraction in one float32 STFT pass.
+
+        Instead of running filtfilt in the time domain first, each STFT bin is scaled by
+        the filter's |H(f)|^2, the response filtfilt applies. Because that gain is real
+        and non-negative, the noise PSD of the filtered signal is the gain times the
+        noise PSD of the raw one. So one transform is enough.
+        """
+        waveform = np.ascontiguousarray(waveform, dtype=np.float32)
+
+        # A single block with unbounded noise history sees every frame, like the full-signal path
+        enhancer = StreamingEnhancer(
+            self.target_sample_rate,
+            noise_history_frames=None,
+            noise_sample_frames=self.noise_sample_frames
+        )
+        enhanced = np.concatenate((enhancer.process(waveform), enhancer.flush()))
+
+        return np.ascontiguousarray(enhanced)
+
+
+def preprocess_file(file_path):
+    """
+    `AudioPreprocessor.preprocess_local` as a module-level function for the process pool.
+    """
+    return AudioPreprocessor().preprocess_local(file_path)
+
+
+def estimate_noise_psd(magnitudes: np.ndarray, max_frames: int) -> np.ndarray:
+    """
+    Per-bin median of STFT magnitudes (bins x frames), computed on at most
+    `max_frames` evenly spaced frames instead of all of them.
+    """
+    step = max(magnitudes.shape[1] // max(max_frames, 1), 1)
+    return np.median(magnitudes[:, ::step], axis=1)
+
+
+class StreamingEnhancer:
+    """
+    Block-by-block version of `AudioPreprocessor.enhance_fused`.
+
+    It uses the same STFT framing and scaling as `scipy.signal.stft`/`istft` (Hann,
+    1024 samples, 50% overlap), with overlap-add across block edges. The band-pass
+    is the same per-bin |H(f)|^2 gain. The noise PSD is the median over a bounded
+    history of recent frames (or every frame so far when `noise_history_frames`
+    is None) instead of the whole file. Everything runs in float32.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        nperseg: int = 1024,
+        noise_history_frames: Optional[int] = 312,
+        noise_sample_frames: int = 512
+    ):
+        self.nperseg = nperseg
+        self.hop = nperseg // 2
+        self.window = signal.get_window('hann', nperseg).astype(np.float32)
+        self.scale = self.window.sum()
+        # Steady-state overlap-add normalisation, as istft divides by the summed squared window
+        self.norm = self.window[:self.hop] ** 2 + self.window[self.hop:] ** 2
+        self.gain = bandpass_gain(np.fft.rfftfreq(nperseg, 1 / sample_rate), sample_rate)
+
+        self.noise_history = deque(maxlen=max(noise_history_frames, 1) if noise_history_frames else None)
+        self.noise_sample_frames = noise_sample_frames
+
+        # stft pads nperseg // 2 zeros in front; the matching output is dropped again
+        self.pending = np.zeros(self.hop, dtype=np.float32)
+        self.overlap = np.zeros(nperseg - self.hop, dtype=np.float32)
+        self.to_skip = self.hop
+        self.samples_in = 0
+        self.samples_out = 0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        Feed the next input block and return every output sample that is now final.
+        """
+        block = np.asarray(block, dtype=np.float32)
+        self.samples_in += len(block)
+
+        self.pending = np.concatenate((self.pending, block))
+        return self._emit(self._process_frames())
+
+    def flush(self) -> np.ndarray:
+        """
+        Pad the end like `scipy.signal.stft` does and return the remaining output.
+        """
+        self.pending = np.concatenate((self.pending, np.zeros(self.nperseg, dtype=np.float32)))
+        return self._emit(self._process_frames(), final=True)
+
+    def _process_frames(self) -> np.ndarray:
+        n_frames = (len(self.pending) - self.nperseg) // self.hop + 1
+        if n_frames <= 0:
+            return np.zeros(0, dtype=np.float32)
+
+        frames = np.lib.stride_tricks.sliding_window_view(self.pending, self.nperseg)[::self.hop][:n_frames]
+        spectrum = scipy_fft.rfft(frames * self.window, axis=1) / self.scale
+
+        # Noise PSD over the bounded frame history
+        self.noise_history.extend(np.abs(spectrum))
+        noise_psd = estimate_noise_psd(np.asarray(self.noise_history).T, self.noise_sample_frames)
+        spectrum -= noise_psd[None, :]
+        spectrum *= self.gain[None, :]
+
+        # Inverse transform and overlap-add onto the tail carried from the previous block
+        frames_out = scipy_fft.irfft(spectrum * self.scale, n=self.nperseg, axis=1) * self.window
+        # With 50% overlap every hop-sized slot gets the second half of one frame and the first half of the next
+        output = np.zeros((n_frames + 1, self.hop), dtype=np.float32)
+        output[0] = self.overlap
+        output[:-1] += frames_out[:, :self.hop]
+        output[1:] += frames_out[:, self.hop:]
+        output = output.reshape(-1)
+
+        ready = output[:n_frames * self.hop]
+        self.overlap = output[n_frames * self.hop:].copy()
+        self.pending = self.pending[n_frames * self.hop:]
+
+        return ready / np.tile(self.norm, n_frames)
+
+    def _emit(self, output: np.ndarray, final: bool = False) -> np.ndarray:
+        if self.to_skip:
+            skipped = min(self.to_skip, len(output))
+            output = output[skipped:]
+            self.to_skip -= skipped
+        if final:
+            # Trim the end padding so the stream is exactly as long as its input
+            output = output[:max(self.samples_in - self.samples_out, 0)]
+        self.samples_out += len(output)
+        return np.ascontiguousarray(output)
@@ -1,16 +1,214 @@
 import os
-from fastapi import UploadFile
+import shutil
+import hashlib
+import tempfile
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from app.core.config import settings
 
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ImportError:
+    # python-multipart releases before 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
 
-def save_temp_file(file: UploadFile) -> str:
-    temp_path = f"temp_{file.filename}"
-    with open(temp_path, "wb") as f:
-        f.write(file.file.read())
-    print(f"File saved to {temp_path}")
-    return temp_path
+# Text fields sent along with an upload (language code, ...) are short
+MAX_FORM_FIELD_BYTES = 64 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size or duration limit."""
+
+
+class UploadFormError(Exception):
+    """Raised when a request body is not the multipart form an upload endpoint expects."""
+
+
+class SpooledUpload(NamedTuple):
+    path: str
+    sha256: str
+    size: int
+    filename: Optional[str] = None
+
+
+class _MultipartUpload:
+    """
+    python-multipart callbacks that route the `file_field` part into a new file in
+    `directory` and collect the other parts as text fields.
+
+    Callbacks run inside the parser, so they only check the size and buffer file
+    data in `pending`; the caller hashes and writes it out in larger blocks.
+    """
+
+    def __init__(
+        self,
+        file_field: str,
+        directory: Optional[str],
+        max_bytes: int,
+        accept_filename: Optional[Callable[[str], None]]
+    ):
+        self.file_field = file_field
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.accept_filename = accept_filename
+        self.headers: Dict[bytes, bytes] = {}
+        self.header_field = b""
+        self.header_value = b""
+        self.field_name: Optional[str] = None
+        self.in_file = False
+        self.fields: Dict[str, bytearray] = {}
+        self.filename: Optional[str] = None
+        self.path: Optional[str] = None
+        self.file = None
+        self.size = 0
+        self.pending = bytearray()
+
+    def callbacks(self) -> Dict[str, Callable]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self.headers = {}
+        self.field_name = None
+        self.in_file = False
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = b""
+        self.header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+
+        if filename is None:
+            self.field_name = name
+            self.fields[name] = bytearray()
+        elif name == self.file_field and self.path is None:
+            self.filename = os.path.basename(filename.decode("utf-8", "replace"))
+            if self.accept_filename is not None:
+                # Refuse the wrong file type before any of it is stored
+                self.accept_filename(self.filename)
+            # Keep the extension, never the client's name: concurrent uploads can share a filename
+            _, extension = os.path.splitext(self.filename)
+            fd, self.path = tempfile.mkstemp(prefix="upload_", suffix=extension.lower(), dir=self.directory)
+            self.file = os.fdopen(fd, "wb")
+            self.in_file = True
+        # Any other file part is skipped
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self.in_file:
+            self.size += end - start
+            if self.max_bytes and self.size > self.max_bytes:
+                raise UploadTooLargeError(f"Upload exceeds the limit of {self.max_bytes} bytes")
+            self.pending += data[start:end]
+        elif self.field_name is not None:
+            value = self.fields[self.field_name]
+            value += data[start:end]
+            if len(value) > MAX_FORM_FIELD_BYTES:
+                raise UploadFormError(f"Form field '{self.field_name}' is too long")
+
+    def on_part_end(self):
+        self.in_file = False
+        self.field_name = None
+
+
+def _write_block(file, digest, block: bytes):
+    digest.update(block)
+    file.write(block)
+
+
+async def spool_request_upload(
+    request: Request,
+    directory: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    file_field: str = "file",
+    accept_filename: Optional[Callable[[str], None]] = None
+) -> Tuple[SpooledUpload, Dict[str, str]]:
+    """
+    Stream a multipart/form-data request body straight into a new, uniquely named
+    file, hashing it on the way. Unlike an `UploadFile` parameter, the body is not
+    spooled to a temporary file by the framework first, so every byte is written
+    to disk once.
+
+    `accept_filename` sees the client's filename before any data is stored and may
+    raise to refuse it. Data is hashed and written in `chunk_size` blocks in the
+    threadpool. Once more than `max_bytes` have arrived, the partial file is removed
+    and UploadTooLargeError is raised.
+
+    Returns:
+        Tuple[SpooledUpload, Dict[str, str]]: the stored file and the form's text fields
+    """
+    max_bytes = settings.UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_BYTES
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadFormError("Expected a multipart/form-data upload")
+
+    upload = _MultipartUpload(file_field, directory, max_bytes, accept_filename)
+    parser = multipart.MultipartParser(boundary, upload.callbacks())
+    digest = hashlib.sha256()
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if len(upload.pending) >= chunk_size:
+                block = bytes(upload.pending)
+                upload.pending.clear()
+                await run_in_threadpool(_write_block, upload.file, digest, block)
+        parser.finalize()
+
+        if upload.path is None:
+            raise UploadFormError(f"No file in form field '{file_field}'")
+        await run_in_threadpool(_write_block, upload.file, digest, bytes(upload.pending))
+        upload.file.close()
+    except BaseException:
+        if upload.file is not None:
+            upload.file.close()
+            delete_file(upload.path)
+        raise
+
+    print(f"File saved to {upload.path} ({upload.size} bytes)")
+    fields = {name: value.decode("utf-8", "replace") for name, value in upload.fields.items()}
+    return SpooledUpload(upload.path, digest.hexdigest(), upload.size, upload.filename), fields
 
 
 def delete_file(file_path: str):
     if os.path.exists(file_path):
         os.remove(file_path)
         print(f"Deleted file: {file_path}")
+
+
+def create_workspace() -> str:
+    """
+    Create a private temporary directory holding every file a single job spills to disk.
+    """
+    workspace = tempfile.mkdtemp(prefix="barta_job_")
+    print(f"Created workspace {workspace}")
+    return workspace
+
+
+def delete_workspace(workspace: str):
+    if workspace and os.path.isdir(workspace):
+        shutil.rmtree(workspace, ignore_errors=True)
+        print(f"Deleted workspace: {workspace}")
@@ -0,0 +1,167 @@
+import math
+import mmap
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, NamedTuple, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+# Where POSIX shared memory segments live on Linux
+_SHM_DIR = "/dev/shm"
+
+
+class SharedArray(NamedTuple):
+    """Reference to an array a worker left in a shared memory segment."""
+    name: str
+    shape: tuple
+    dtype: str
+
+
+def _share(value: Any, prefix: str, created: list) -> Any:
+    """
+    Worker side: move every non-empty array in `value` (possibly nested in tuples
+    or lists) into its own shared memory segment and return references instead.
+    Segments are named `prefix` plus a counter kept in `created`.
+    """
+    if isinstance(value, np.ndarray) and value.nbytes:
+        shm = shared_memory.SharedMemory(name=f"{prefix}{len(created)}", create=True, size=value.nbytes)
+        created.append(shm.name)
+        try:
+            np.ndarray(value.shape, dtype=value.dtype, buffer=shm.buf)[...] = value
+            return SharedArray(shm.name, value.shape, value.dtype.str)
+        finally:
+            # The parent unlinks the segment once it has mapped it
+            shm.close()
+    if isinstance(value, (tuple, list)):
+        return type(value)(_share(item, prefix, created) for item in value)
+    return value
+
+
+def _attach(ref: SharedArray) -> np.ndarray:
+    """
+    Parent side: map a worker's segment as an array and unlink its name right away.
+
+    On Linux the segment is mapped directly, so the array is not copied and the
+    memory is released when the array is garbage collected. Elsewhere the array
+    is copied out of the segment.
+    """
+    shm = shared_memory.SharedMemory(name=ref.name)
+    try:
+        count = math.prod(ref.shape)
+        path = os.path.join(_SHM_DIR, ref.name.lstrip("/"))
+        if os.path.exists(path):
+            with open(path, "r+b") as f:
+                mapping = mmap.mmap(f.fileno(), count * np.dtype(ref.dtype).itemsize)
+            return np.frombuffer(mapping, dtype=ref.dtype, count=count).reshape(ref.shape)
+        return np.ndarray(ref.shape, dtype=ref.dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _unshare(value: Any) -> Any:
+    if isinstance(value, SharedArray):
+        return _attach(value)
+    if isinstance(value, (tuple, list)):
+        return type(value)(_unshare(item) for item in value)
+    return value
+
+
+def _sweep(prefix: str):
+    """
+    Unlink every segment whose name starts with `prefix`, for results that never
+    reached the parent (failed or cancelled task, crashed worker) or failed to attach.
+    """
+    if not os.path.isdir(_SHM_DIR):
+        return
+    for name in os.listdir(_SHM_DIR):
+        if not name.startswith(prefix):
+            continue
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            continue
+        shm.close()
+        # Also unregisters the segment from the resource tracker the worker registered it with
+        shm.unlink()
+
+
+def _run_shared(func: Callable, args: tuple, kwargs: dict, prefix: str) -> Any:
+    return _share(func(*args, **kwargs), prefix, [])
+
+
+class AudioProcessPool:
+    """
+    Process pool for CPU-bound audio work (decoding, filtering) that would otherwise
+    hold the GIL in the API process.
+
+    Arrays in a task's result come back through shared memory instead of being
+    pickled through the pool's pipe. With `max_workers` 0 tasks run inline.
+
+    Every task's segments are named with a prefix the parent picks, so whenever a
+    result doesn't make it back (the task failed or was cancelled, a worker died,
+    attaching failed) its segments are found and unlinked; `shutdown` sweeps the
+    whole pool's prefix.
+    """
+
+    def __init__(self, max_workers: int, start_method: str = "spawn"):
+        self.max_workers = max_workers
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # Short: macOS limits shared memory names to 31 characters
+        self._prefix = f"bp{uuid.uuid4().hex[:6]}_"
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(self.start_method)
+                )
+            return self._executor
+
+    def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run module-level `func(*args, **kwargs)` in a worker process and return its result.
+        Blocks the calling thread, not the event loop when called from the threadpool.
+        """
+        if self.max_workers <= 0:
+            return func(*args, **kwargs)
+        executor = self._get_executor()
+        task_prefix = f"{self._prefix}{uuid.uuid4().hex[:8]}_"
+        try:
+            return _unshare(executor.submit(_run_shared, func, args, kwargs, task_prefix).result())
+        except BrokenProcessPool:
+            # A worker died; later tasks get a fresh pool
+            self._discard(executor)
+            _sweep(task_prefix)
+            raise
+        except BaseException:
+            _sweep(task_prefix)
+            raise
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            # Let running tasks finish, then remove whatever their callers didn't collect
+            executor.shutdown(wait=True, cancel_futures=True)
+            _sweep(self._prefix)
+
+
+audio_process_pool = AudioProcessPool(settings.AUDIO_PROCESS_WORKERS, settings.AUDIO_PROCESS_START_METHOD)
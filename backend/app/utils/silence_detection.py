@@ -0,0 +1,163 @@
+import math
+from typing import Tuple
+
+import numpy as np
+
+# Samples per slab when accumulating block energies, keeps temporaries small on long audio
+_SLAB_BLOCKS = 1 << 14
+
+
+def _full_scale(samples: np.ndarray) -> float:
+    """
+    Maximum possible amplitude for the sample dtype (dBFS reference).
+    """
+    if np.issubdtype(samples.dtype, np.integer):
+        return float(-np.iinfo(samples.dtype).min)
+    return 1.0
+
+
+def _block_energies(samples: np.ndarray, block: int) -> np.ndarray:
+    """
+    Sum of squares of every consecutive `block`-sample block (trailing partial block dropped).
+    """
+    n_blocks = len(samples) // block
+    energies = np.empty(n_blocks, dtype=np.float64)
+    for first in range(0, n_blocks, _SLAB_BLOCKS):
+        last = min(first + _SLAB_BLOCKS, n_blocks)
+        slab = samples[first * block:last * block].astype(np.float64).reshape(-1, block)
+        energies[first:last] = np.einsum("ij,ij->i", slab, slab)
+    return energies
+
+
+def _window_energy(samples: np.ndarray, start: int, length: int) -> float:
+    window = samples[start:start + length].astype(np.float64)
+    return float(np.dot(window, window))
+
+
+def detect_silence(
+    samples: np.ndarray,
+    sample_rate: int,
+    min_silence_len: int = 1000,
+    silence_thresh: float = -16,
+    seek_step: int = 1
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized equivalent of pydub.silence.detect_silence for a mono sample array.
+
+    A window of `min_silence_len` ms starting every `seek_step` ms is silent when its
+    RMS is at or below `silence_thresh` dBFS. Overlapping silent windows are merged.
+
+    Returns:
+        (starts, ends) sample indices of the silent ranges
+    """
+    samples = np.asarray(samples)
+    window = min_silence_len * sample_rate // 1000
+    step = max(seek_step * sample_rate // 1000, 1)
+    empty = np.empty(0, dtype=np.int64)
+
+    if window <= 0 or len(samples) < window:
+        return empty, empty
+
+    threshold = 10 ** (silence_thresh / 20) * _full_scale(samples)
+
+    # Energy of every window from prefix sums over blocks that tile both the step and the window
+    block = math.gcd(step, window)
+    prefix = np.concatenate(([0.0], np.cumsum(_block_energies(samples, block))))
+    last_start = len(samples) - window
+    starts = np.arange(0, last_start + 1, step, dtype=np.int64)
+    first_block = starts // block
+    energies = prefix[first_block + window // block] - prefix[first_block]
+
+    if last_start % step:
+        # pydub always checks the final window, which need not sit on the step grid
+        starts = np.append(starts, last_start)
+        energies = np.append(energies, _window_energy(samples, last_start, window))
+
+    rms = np.sqrt(energies / window)
+    if np.issubdtype(samples.dtype, np.integer):
+        # audioop.rms truncates to an integer, match it so borderline windows agree with pydub
+        rms = np.floor(rms)
+    silent_starts = starts[rms <= threshold]
+    if len(silent_starts) == 0:
+        return empty, empty
+
+    # A new range begins where consecutive silent windows are neither adjacent nor overlapping
+    gaps = np.diff(silent_starts)
+    breaks = np.flatnonzero((gaps != step) & (gaps > window))
+    range_starts = silent_starts[np.concatenate(([0], breaks + 1))]
+    range_ends = silent_starts[np.concatenate((breaks, [len(silent_starts) - 1]))] + window
+    return range_starts, range_ends
+
+
+def detect_nonsilent(
+    samples: np.ndarray,
+    sample_rate: int,
+    min_silence_len: int = 1000,
+    silence_thresh: float = -16,
+    seek_step: int = 1
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized equivalent of pydub.silence.detect_nonsilent.
+
+    Returns:
+        (starts, ends) sample indices of the non-silent ranges
+    """
+    samples = np.asarray(samples)
+    silent_starts, silent_ends = detect_silence(samples, sample_rate, min_silence_len, silence_thresh, seek_step)
+
+    if len(silent_starts) == 0:
+        return np.array([0], dtype=np.int64), np.array([len(samples)], dtype=np.int64)
+
+    starts = np.concatenate(([0], silent_ends))
+    ends = np.concatenate((silent_starts, [len(samples)]))
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+
+def split_on_silence(
+    samples: np.ndarray,
+    sample_rate: int,
+    min_silence_len: int = 1000,
+    silence_thresh: float = -16,
+    keep_silence: int = 100,
+    seek_step: int = 1,
+    drop_silent: bool = True
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized equivalent of pydub.silence.split_on_silence that returns chunk
+    boundaries instead of copied audio. Parameters use the same units (ms, dBFS).
+
+    Each non-silent range is padded by `keep_silence` ms; where two padded ranges
+    overlap the silence between them is split evenly. With `drop_silent`, chunks
+    whose overall RMS is at or below `silence_thresh` (e.g. a lone click padded
+    with silence) are removed so they never reach a recognizer.
+
+    Returns:
+        (starts, ends) sample indices of the chunks
+    """
+    samples = np.asarray(samples)
+    starts, ends = detect_nonsilent(samples, sample_rate, min_silence_len, silence_thresh, seek_step)
+    if len(starts) == 0:
+        return starts, ends
+
+    keep = keep_silence * sample_rate // 1000
+    starts = starts - keep
+    ends = ends + keep
+
+    overlap = starts[1:] < ends[:-1]
+    middle = (ends[:-1] + starts[1:]) // 2
+    ends[:-1] = np.where(overlap, middle, ends[:-1])
+    starts[1:] = np.where(overlap, middle, starts[1:])
+
+    starts = np.clip(starts, 0, len(samples))
+    ends = np.clip(ends, 0, len(samples))
+
+    if drop_silent:
+        threshold = (10 ** (silence_thresh / 20) * _full_scale(samples)) ** 2
+        audible = np.array([
+            end > start and _window_energy(samples, start, end - start) > threshold * (end - start)
+            for start, end in zip(starts, ends)
+        ], dtype=bool)
+        starts, ends = starts[audible], ends[audible]
+
+    return starts, ends
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+
+def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    SHA-256 of a file's bytes, read in blocks so large uploads are never fully in memory.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    Content-addressed on-disk cache of transcription results (and summary notes).
+
+    Entries are JSON files named by a key derived from the content and the config
+    that produced them, e.g. the audio hash, the language and the engine config.
+    The total size is capped at `max_bytes`. The least recently used entries (by
+    file mtime, refreshed on every hit) are evicted first.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.total_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(self.directory)
+            if entry.is_file() and entry.name.endswith(".json")
+        )
+
+    @staticmethod
+    def make_key(audio_hash: str, language_code: Optional[str], config: Dict) -> str:
+        payload = json.dumps(
+            {"audio": audio_hash, "language_code": language_code, "config": config},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            # Refresh the mtime so eviction treats this entry as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return value
+
+    def contains(self, key: str) -> bool:
+        """
+        Whether an entry exists, without counting a lookup or refreshing its mtime.
+        """
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, value: Any):
+        path = self._path(key)
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            with self.lock:
+                previous = os.path.getsize(path) if os.path.exists(path) else 0
+                os.replace(temp_path, path)
+                self.total_bytes += len(data) - previous
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self._evict()
+
+    def _evict(self):
+        with self.lock:
+            if self.total_bytes <= self.max_bytes:
+                return
+
+            entries = sorted(
+                (entry for entry in os.scandir(self.directory)
+                 if entry.is_file() and entry.name.endswith(".json")),
+                key=lambda entry: entry.stat().st_mtime
+            )
+            for entry in entries:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                except OSError:
+                    continue
+                self.total_bytes -= size
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "size_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+transcript_cache = (
+    TranscriptCache(settings.TRANSCRIPT_CACHE_DIR, settings.TRANSCRIPT_CACHE_MAX_BYTES)
+    if settings.TRANSCRIPT_CACHE_ENABLED else None
+)
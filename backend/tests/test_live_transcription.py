@@ -0,0 +1,151 @@
+import concurrent.futures
+import datetime
+import types
+
+import numpy as np
+
+from app.services.live_transcription import LiveTranscriptionSession
+from app.services.transcription_google import GoogleTranscriptionService, SAMPLE_RATE
+
+PAUSE_THRESHOLD = 0.4
+
+
+class RunClient:
+    """
+    Fake SpeechClient: one word per audible run of the request audio, with the run's
+    start and end inside the request as word offsets.
+    """
+
+    frame = SAMPLE_RATE // 100
+
+    def __init__(self):
+        self.requests = 0
+
+    def recognize(self, config, audio):
+        self.requests += 1
+        pcm = np.frombuffer(audio.content, dtype="<i2").astype(np.float64)
+        frames = len(pcm) // self.frame
+        loud = np.abs(pcm[:frames * self.frame]).reshape(frames, self.frame).mean(axis=1) > 1000
+
+        words = []
+        start = None
+        for i, is_loud in enumerate(list(loud) + [False]):
+            if is_loud and start is None:
+                start = i
+            elif not is_loud and start is not None:
+                words.append(types.SimpleNamespace(
+                    word=f"w{len(words)}",
+                    start_time=datetime.timedelta(seconds=start / 100),
+                    end_time=datetime.timedelta(seconds=i / 100)
+                ))
+                start = None
+
+        alternative = types.SimpleNamespace(words=words)
+        return types.SimpleNamespace(results=[types.SimpleNamespace(alternatives=[alternative])])
+
+
+class ImmediateExecutor(concurrent.futures.Executor):
+    """Runs each request in the calling thread, so a window is done as soon as it's submitted."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def tone(seconds):
+    t = np.arange(int(seconds * SAMPLE_RATE))
+    return (8000 * np.sin(2 * np.pi * 440 * t / SAMPLE_RATE)).astype(np.int16)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.int16)
+
+
+def parse_timestamp(value):
+    hours, minutes, seconds = value.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def make_session(client):
+    service = GoogleTranscriptionService(speech_client=client, cache=None)
+    return LiveTranscriptionSession(
+        service,
+        pause_threshold=PAUSE_THRESHOLD,
+        split_interval=0.5,
+        executor=ImmediateExecutor()
+    )
+
+
+def stream(session, audio, frame_bytes=641):
+    """
+    Feed `audio` in frames not aligned to samples, polling after each one.
+    Returns (seconds fed when the phrase arrived, phrase) pairs.
+    """
+    data = audio.tobytes()
+    arrivals = []
+    for offset in range(0, len(data), frame_bytes):
+        session.feed(data[offset:offset + frame_bytes])
+        fed = min(offset + frame_bytes, len(data)) / (2 * SAMPLE_RATE)
+        arrivals.extend((fed, phrase) for phrase in session.poll())
+    session.finish()
+    arrivals.extend((None, phrase) for phrase in session.poll())
+    return arrivals
+
+
+def test_phrases_arrive_after_each_pause_with_stream_offsets():
+    # Three utterances separated by pauses well above the phrase threshold
+    spoken = [(0.5, 1.0), (3.0, 1.0), (5.5, 2.0)]
+    pieces = []
+    position = 0.0
+    for start, length in spoken:
+        pieces += [silence(start - position), tone(length)]
+        position = start + length
+    audio = np.concatenate(pieces + [silence(0.3)])
+
+    session = make_session(RunClient())
+    arrivals = stream(session, audio)
+
+    assert [phrase["text"] for _, phrase in arrivals] == ["w0", "w0", "w0"]
+    for index, (fed, phrase) in enumerate(arrivals):
+        start, length = spoken[index]
+        assert abs(parse_timestamp(phrase["start"]) - start) <= 0.02
+        assert abs(parse_timestamp(phrase["end"]) - (start + length)) <= 0.02
+        if index + 1 < len(spoken):
+            # Pushed during the pause, before the next utterance starts
+            assert fed is not None
+            assert start + length + PAUSE_THRESHOLD < fed < spoken[index + 1][0]
+        else:
+            # Nothing follows the last pause, so only the end of the stream settles it
+            assert fed is None
+
+    assert session.complete
+    assert [phrase for _, phrase in arrivals] == session.transcript
+
+
+def test_long_speech_without_pause_is_cut_at_the_window_limit():
+    client = RunClient()
+    service = GoogleTranscriptionService(speech_client=client, cache=None, max_window_seconds=2.0)
+    session = LiveTranscriptionSession(service, split_interval=0.5, executor=ImmediateExecutor())
+
+    audio = np.concatenate([silence(0.2), tone(5.0), silence(0.5)])
+    data = audio.tobytes()
+    sent_before_end = None
+    largest_buffer = 0
+    for offset in range(0, len(data), 3200):
+        session.feed(data[offset:offset + 3200])
+        largest_buffer = max(largest_buffer, len(session.buffer))
+        if offset + 3200 >= int(5.2 * SAMPLE_RATE) * 2 and sent_before_end is None:
+            sent_before_end = client.requests
+    session.finish()
+    session.poll()
+
+    # Recognition started while the speech was still going on
+    assert sent_before_end >= 2
+    # Split buffers never hold more than one window of open speech
+    assert largest_buffer < 2.0 * SAMPLE_RATE
+    starts = [parse_timestamp(phrase["start"]) for phrase in session.transcript]
+    assert abs(starts[0] - 0.2) <= 0.02
@@ -0,0 +1,30 @@
+from app.services.summaryTask_service import SUMMARY_SECTIONS, sections_complete
+
+SECTIONS = ["Topics", "Decisions", "Action Items"]
+
+
+def test_multi_paragraph_final_section_is_not_complete():
+    text = "Topics:\nbudget\n\nDecisions:\nhire two people\n\nAction Items:\n1. x\n\n2. y"
+    assert not sections_complete(text, SECTIONS)
+    assert not sections_complete(text + "\n\n", SECTIONS)
+
+
+def test_final_section_is_complete_once_a_heading_starts_again():
+    text = "Topics:\nbudget\n\nDecisions:\nhire\n\nAction Items:\n1. x\n\n2. y\n\n"
+    assert sections_complete(text + "Topics:\nbudget again", SECTIONS)
+    assert sections_complete(text + "1. **Topics**", SECTIONS)
+
+
+def test_title_mentioned_inside_a_section_is_not_a_heading():
+    text = "Topics:\nbudget\n\nDecisions:\nhire\n\nAction Items:\n1. revisit the Topics list\n"
+    assert not sections_complete(text, SECTIONS)
+
+
+def test_missing_section_is_not_complete():
+    assert not sections_complete("Topics:\nbudget\n\nAction Items:\n1. x\n\n", SECTIONS)
+
+
+def test_numbered_bengali_summary():
+    body = "".join(f"{number}. {title}:\nবিষয়বস্তু\n\n" for number, title in zip("১২৩৪", SUMMARY_SECTIONS))
+    assert not sections_complete(body + "আরও একটি অনুচ্ছেদ\n\n", SUMMARY_SECTIONS)
+    assert sections_complete(body + f"১. {SUMMARY_SECTIONS[0]}:", SUMMARY_SECTIONS)